@@ -4,8 +4,19 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from models.base import Base
-from repos.database import engine
-from routers import auth, datasources, datatables, projects, query, warehouses
+from repos import jobs as job_db
+from repos.database import SessionLocal, engine
+from routers import (
+    auth,
+    datasources,
+    datatables,
+    jobs,
+    projects,
+    query,
+    warehouses,
+)
+from utils import cursors, introspection, pools
+from utils import jobs as job_runner
 from utils import settings as config
 
 # Create and configure the app
@@ -25,6 +36,20 @@ app.add_middleware(
 @app.on_event("startup")
 def startup_event():
     Base.metadata.create_all(bind=engine)
+    # jobs of the previous run can't be resumed
+    db = SessionLocal()
+    try:
+        job_db.fail_unfinished_jobs(db)
+    finally:
+        db.close()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    job_runner.shutdown()
+    introspection.shutdown()
+    cursors.close_all()
+    pools.close_all()
 
 
 @app.exception_handler(RequestValidationError)
@@ -42,6 +67,7 @@ app.include_router(datasources.router)
 app.include_router(datatables.router)
 app.include_router(warehouses.router)
 app.include_router(query.router)
+app.include_router(jobs.router)
 
 
 # Logging
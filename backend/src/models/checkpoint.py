@@ -0,0 +1,37 @@
+import uuid
+
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from .base import Base
+from .datatable import DataTableDB
+
+
+class CheckpointDB(Base):
+    __tablename__ = "IngestCheckpoints"
+    id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        unique=True,
+        nullable=False,
+        index=True,
+    )
+    datatable_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey(DataTableDB.id, ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    chunk = Column(Integer, nullable=False)
+    # staged file of the chunk, empty when Spark reads the source itself
+    filepath = Column(String, nullable=True)
+    state = Column(
+        Enum("staged", "written", name="checkpoint_state"),
+        nullable=False,
+    )
+    # Delta version of the table before the chunks were written
+    table_version = Column(Integer, nullable=True)
+    updated_at = Column(
+        DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
+    )
@@ -1,7 +1,7 @@
 import uuid
 
 from models.datasource import DatasourceDB
-from sqlalchemy import Column, ForeignKey, String
+from sqlalchemy import Column, Enum, ForeignKey, String
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 
@@ -26,6 +26,14 @@ class DataTableDB(Base):
         index=True,
     )
     columns = Column(JSONB, nullable=False)
+    watermark_column = Column(String, nullable=True)
+    watermark = Column(String, nullable=True)
+    write_mode = Column(
+        Enum("append", "overwrite", "merge", name="write_mode"),
+        nullable=False,
+        default="append",
+    )
+    key_columns = Column(JSONB, nullable=True)
 
     warehouseDatatables = relationship(
         "WarehouseDataTableDB", cascade="all, delete", back_populates="datatables"
@@ -0,0 +1,51 @@
+import uuid
+
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, String, func
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+from .base import Base
+from .user import UserDB
+from .warehouse import WarehouseDB
+
+
+class JobDB(Base):
+    __tablename__ = "Jobs"
+    id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        unique=True,
+        nullable=False,
+        index=True,
+    )
+    warehouse_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey(WarehouseDB.id, ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    created_by = Column(
+        UUID(as_uuid=True),
+        ForeignKey(UserDB.id, ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    status = Column(
+        Enum(
+            "pending",
+            "running",
+            "succeeded",
+            "failed",
+            "cancelled",
+            name="job_status",
+        ),
+        nullable=False,
+        default="pending",
+    )
+    # table name -> ingestion status and details
+    progress = Column(JSONB, nullable=False, default=dict)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(
+        DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
+    )
@@ -0,0 +1,68 @@
+from typing import List
+from uuid import UUID
+
+from models.checkpoint import CheckpointDB
+from models.datatable import DataTableDB
+from schema.checkpoint import CheckpointModel, CheckpointState
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+
+def get_table_checkpoints(db: Session, dt_id: UUID) -> List[CheckpointModel]:
+    query = (
+        select(CheckpointDB)
+        .where(CheckpointDB.datatable_id == dt_id)
+        .order_by(CheckpointDB.chunk)
+    )
+    checkpoints_db = db.execute(query).scalars().all()
+    db.commit()
+    return list(map(CheckpointModel.from_orm, checkpoints_db))
+
+
+def create_checkpoints(
+    db: Session, dt_id: UUID, filepaths: List[str], table_version: int | None
+) -> None:
+    """
+    Record staged chunks of a table, replacing previous checkpoints
+    """
+    db.execute(delete(CheckpointDB).where(CheckpointDB.datatable_id == dt_id))
+    for chunk, filepath in enumerate(filepaths):
+        db.add(
+            CheckpointDB(
+                datatable_id=dt_id,
+                chunk=chunk,
+                filepath=filepath,
+                state=CheckpointState.STAGED.value,
+                table_version=table_version,
+            )
+        )
+    db.commit()
+
+
+def set_chunk_state(
+    db: Session, dt_id: UUID, chunk: int, state: CheckpointState
+) -> None:
+    query = (
+        update(CheckpointDB)
+        .where(CheckpointDB.datatable_id == dt_id)
+        .where(CheckpointDB.chunk == chunk)
+        .values(state=state.value)
+    )
+    rows_affected = db.execute(query).rowcount  # type: ignore
+    if rows_affected == 0:
+        db.add(CheckpointDB(datatable_id=dt_id, chunk=chunk, state=state.value))
+    db.commit()
+
+
+def commit_table(db: Session, dt_id: UUID, watermark: str | None) -> None:
+    """
+    Forget checkpoints of an ingested table together with saving its new watermark
+    """
+    db.execute(delete(CheckpointDB).where(CheckpointDB.datatable_id == dt_id))
+    if watermark is not None:
+        db.execute(
+            update(DataTableDB)
+            .where(DataTableDB.id == dt_id)
+            .values(watermark=watermark)
+        )
+    db.commit()
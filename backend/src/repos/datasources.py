@@ -45,6 +45,13 @@ def get_datasources_by_id(db: Session, ids: List[UUID]) -> List[DatasourceModel]
     return []
 
 
+def get_project_datasources(db: Session, project_id: UUID) -> List[DatasourceModel]:
+    query = select(DatasourceDB).where(DatasourceDB.project_id == project_id)
+    ds_db = db.execute(query).scalars().all()
+    db.commit()
+    return list(map(DatasourceModel.from_orm, ds_db))
+
+
 def get_datasource_owner(db: Session, ds_id: UUID) -> UserModel | None:
     query = (
         select(UserDB)
@@ -1,9 +1,10 @@
 from typing import List
 from uuid import UUID
 
+from models.datasource import DatasourceDB
 from models.datatable import DataTableDB
 from models.warehouseDatatable import WarehouseDataTableDB
-from schema.datatable import DataTableCreate, DataTableModel
+from schema.datatable import DataTableCreate, DataTableModel, DataTableUpdate
 from schema.warehouseDatatable import WarehouseDataTableCreate, WarehouseDataTableModel
 from sqlalchemy import select, update
 from sqlalchemy.orm import Session
@@ -25,6 +26,17 @@ def get_datasource_tables(
     return []
 
 
+def get_project_table_names(db: Session, project_id: UUID) -> List[str]:
+    query = (
+        select(DataTableDB.name)
+        .join(DatasourceDB, DataTableDB.datasource_id == DatasourceDB.id)
+        .where(DatasourceDB.project_id == project_id)
+    )
+    names = db.execute(query).scalars().all()
+    db.commit()
+    return list(names)
+
+
 def get_table_by_id(db: Session, dt_id: UUID) -> DataTableModel | None:
     query = select(DataTableDB).where(DataTableDB.id == dt_id)
     dt_db = db.execute(query).scalar()
@@ -33,6 +45,32 @@ def get_table_by_id(db: Session, dt_id: UUID) -> DataTableModel | None:
         return DataTableModel.from_orm(dt_db)
 
 
+def update_table(
+    db: Session, dt_id: UUID, dt: DataTableUpdate
+) -> DataTableModel | None:
+    """
+    Change ingestion settings of a table
+    """
+    # explicit nulls clear the settings, omitted fields are kept
+    new_fields = dt.dict(exclude_unset=True)
+    if new_fields.get("write_mode") is None:
+        new_fields.pop("write_mode", None)
+    if "watermark_column" in new_fields:
+        # the next ingestion by a new column is a full reload
+        new_fields["watermark"] = None
+
+    query = (
+        update(DataTableDB)
+        .returning(DataTableDB)
+        .where(DataTableDB.id == dt_id)
+        .values(**new_fields)
+    )
+    new_dt_db = db.execute(query).scalar()
+    db.commit()
+    if new_dt_db is not None:
+        return DataTableModel.from_orm(new_dt_db)
+
+
 def create_tables(db: Session, tables: List[DataTableCreate]) -> List[DataTableModel]:
     ds_id = tables[0].datasource_id
     created_tables: List[DataTableDB] = []
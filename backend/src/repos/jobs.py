@@ -0,0 +1,47 @@
+from uuid import UUID
+
+from models.job import JobDB
+from schema.job import JobModel, JobStatus, JobUpdate
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .database import create_entity
+
+
+def get_job_by_id(db: Session, job_id: UUID) -> JobModel | None:
+    query = select(JobDB).where(JobDB.id == job_id)
+    job_db = db.execute(query).scalar()
+    db.commit()
+    if job_db is not None:
+        return JobModel.from_orm(job_db)
+
+
+def create_job(db: Session, wh_id: UUID, user_id: UUID) -> JobModel:
+    job_db = JobDB(warehouse_id=wh_id, created_by=user_id, progress={})
+    job_created: JobDB = create_entity(db, job_db)  # type: ignore
+    return JobModel.from_orm(job_created)
+
+
+def update_job(db: Session, job_id: UUID, job: JobUpdate) -> JobModel | None:
+    new_fields = job.dict(exclude_none=True)
+
+    query = (
+        update(JobDB).returning(JobDB).where(JobDB.id == job_id).values(**new_fields)
+    )
+    new_job_db = db.execute(query).scalar()
+    db.commit()
+    if new_job_db is not None:
+        return JobModel.from_orm(new_job_db)
+
+
+def fail_unfinished_jobs(db: Session) -> None:
+    """
+    Mark jobs interrupted by an application restart as failed
+    """
+    query = (
+        update(JobDB)
+        .where(JobDB.status.in_([JobStatus.PENDING.value, JobStatus.RUNNING.value]))
+        .values(status=JobStatus.FAILED.value, error="Interrupted by restart")
+    )
+    db.execute(query)
+    db.commit()
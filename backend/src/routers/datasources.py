@@ -97,6 +97,23 @@ def update_datasource(
     return JSONResponse(content={"details": msg}, status_code=status_code)
 
 
+@router.post("/{ds_id}/refresh")
+def refresh_datasource(
+    ds_id: UUID,
+    user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> JSONResponse:
+    ds_service = DatasourceService(db, user)
+    status_code, msg = ds_service.validate_user_access(ds_id)
+    if status_code != 200:
+        log.info(f"[REFRESH] {status_code} {msg}")
+        return JSONResponse(content={"details": msg}, status_code=status_code)
+
+    status_code, msg = ds_service.refresh_datasource(ds_id)
+    log.info(f"[REFRESH] {status_code} {msg}")
+    return JSONResponse(content={"details": msg}, status_code=status_code)
+
+
 @router.delete("/{ds_id}")
 def delete_datasource(
     ds_id: UUID,
@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from repos.database import get_db
+from schema.datatable import DataTableUpdate
 from schema.user import UserModel
 from services.datasource import DatasourceService
 from sqlalchemy.orm import Session
@@ -33,3 +34,16 @@ def get_datasource_tables(
     return JSONResponse(
         content={"details": jsonable_encoder(msg)}, status_code=status_code
     )
+
+
+@router.put("/{dt_id}")
+def update_datatable(
+    dt_id: UUID,
+    new_data: DataTableUpdate,
+    user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> JSONResponse:
+    ds_service = DatasourceService(db, user)
+    status_code, msg = ds_service.update_datatable(dt_id, new_data)
+    log.info(f"[UPDATE] {status_code} {msg}")
+    return JSONResponse(content={"details": msg}, status_code=status_code)
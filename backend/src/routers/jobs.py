@@ -0,0 +1,54 @@
+from uuid import UUID
+
+import structlog
+from fastapi import APIRouter, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from repos.database import get_db
+from routers.users import get_current_user
+from schema.user import UserModel
+from services.job import JobService
+from sqlalchemy.orm import Session
+
+log = structlog.get_logger(module=__name__)
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}")
+def get_job(
+    job_id: UUID,
+    user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> JSONResponse:
+    job_service = JobService(db, user)
+    status_code, msg = job_service.validate_user_access(job_id)
+    if status_code != 200:
+        log.info(f"[GET] {status_code} {msg}")
+        return JSONResponse(content={"details": msg}, status_code=status_code)
+
+    status_code, msg = job_service.get_job(job_id)
+    log_msg = msg
+    # create response
+    if status_code == 200:
+        log_msg = f"{msg.id} {msg.status.value}"  # type: ignore
+    log.info(f"[GET] {status_code} {log_msg}")
+    return JSONResponse(
+        content={"details": jsonable_encoder(msg)}, status_code=status_code
+    )
+
+
+@router.post("/{job_id}/cancel")
+def cancel_job(
+    job_id: UUID,
+    user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> JSONResponse:
+    job_service = JobService(db, user)
+    status_code, msg = job_service.validate_user_access(job_id)
+    if status_code != 200:
+        log.info(f"[CANCEL] {status_code} {msg}")
+        return JSONResponse(content={"details": msg}, status_code=status_code)
+
+    status_code, msg = job_service.cancel_job(job_id)
+    log.info(f"[CANCEL] {status_code} {msg}")
+    return JSONResponse(content={"details": msg}, status_code=status_code)
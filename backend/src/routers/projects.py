@@ -7,6 +7,7 @@ from fastapi.responses import JSONResponse
 from repos.database import get_db
 from schema.project import ProjectCreate, ProjectUpdate
 from schema.user import UserModel
+from services.datasource import DatasourceService
 from services.project import ProjectService
 from sqlalchemy.orm import Session
 
@@ -81,6 +82,24 @@ def update_project(
     return JSONResponse(content={"details": msg}, status_code=status_code)
 
 
+@router.post("/{project_id}/refresh")
+def refresh_project_datasources(
+    project_id: UUID,
+    user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> JSONResponse:
+    proj_service = ProjectService(db, user)
+    status_code, msg = proj_service.validate_user_access(project_id)
+    if status_code != 200:
+        log.info(f"[REFRESH] {status_code} {msg}")
+        return JSONResponse(content={"details": msg}, status_code=status_code)
+
+    ds_service = DatasourceService(db, user)
+    status_code, msg = ds_service.refresh_project_datasources(project_id)
+    log.info(f"[REFRESH] {status_code} {msg}")
+    return JSONResponse(content={"details": msg}, status_code=status_code)
+
+
 @router.delete("/{project_id}")
 def delete_project(
     project_id: UUID,
@@ -1,28 +1,33 @@
 from uuid import UUID
 
 import structlog
-from fastapi import APIRouter, Depends, Form, UploadFile
+from fastapi import APIRouter, Depends, Form, Header, UploadFile
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from repos.database import get_db
 from schema.query import QueryModel
 from schema.user import UserModel
 from services.project import ProjectService
 from services.query import QueryService
 from sqlalchemy.orm import Session
+from utils import query_cache
 
 from .users import get_current_user
 
 log = structlog.get_logger(module=__name__)
 router = APIRouter(prefix="/query", tags=["query"])
 
+NDJSON = "application/x-ndjson"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
 
 @router.post("/")
 def run_query(
     query: QueryModel,
+    accept: str | None = Header(default=None),
     user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
-) -> JSONResponse:
+) -> Response:
     proj_service = ProjectService(db, user)
     status_code, msg = proj_service.validate_user_access(query.project_id)
     if status_code != 200:
@@ -34,6 +39,11 @@ def run_query(
     if status_code != 200:
         log.info(f"[RUN QUERY] {status_code} {msg}")
         return JSONResponse(content={"details": msg}, status_code=status_code)
+    # stream result rows when client accepts NDJSON
+    if accept is not None and NDJSON in accept:
+        log.info("[RUN QUERY] 200 streaming")
+        stream = query_service.stream_data(query.project_id, query.query)
+        return StreamingResponse(stream, media_type=NDJSON)
     # process query
     status, msg = query_service.run_query(query.project_id, query.query)
     if not status:
@@ -46,29 +56,108 @@ def run_query(
 @router.post("/read")
 def read_data(
     query: QueryModel,
+    accept: str | None = Header(default=None),
     user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
-) -> JSONResponse:
+) -> Response:
     proj_service = ProjectService(db, user)
     status_code, msg = proj_service.validate_user_access(query.project_id)
     if status_code != 200:
         log.info(f"[READ] {status_code} {msg}")
         return JSONResponse(content={"details": msg}, status_code=status_code)
-    # validate query on master node
     query_service = QueryService(db, user)
+    # repeated reads are served from cache without Spark
+    is_streamed = accept is not None and (ARROW_STREAM in accept or NDJSON in accept)
+    if query.page_size is None and not is_streamed:
+        cached = query_service.get_cached_result(query.project_id, query.query)
+        if cached is not None:
+            log.info("[READ] 200 cached")
+            return JSONResponse(
+                content={"details": jsonable_encoder(cached)}, status_code=200
+            )
+    # validate query on master node
     status_code, msg = query_service.validate_query(query.project_id, query.query)
     if status_code != 200:
         log.info(f"[READ] {status_code} {msg}")
         return JSONResponse(content={"details": msg}, status_code=status_code)
+    # send typed result to analytical clients
+    if accept is not None and ARROW_STREAM in accept:
+        status_code, msg = query_service.read_arrow(query.project_id, query.query)
+        if status_code != 200:
+            log.info(f"[READ] {status_code} {msg}")
+            return JSONResponse(content={"details": msg}, status_code=status_code)
+        log.info("[READ] 200 arrow stream")
+        return StreamingResponse(msg, media_type=ARROW_STREAM)  # type: ignore
+    # stream result rows when client accepts NDJSON
+    if accept is not None and NDJSON in accept:
+        log.info("[READ] 200 streaming")
+        stream = query_service.stream_data(query.project_id, query.query)
+        return StreamingResponse(stream, media_type=NDJSON)
+    # return the first page and a cursor to the rest
+    if query.page_size is not None:
+        status_code, msg = query_service.read_page(
+            query.project_id, query.query, query.page_size
+        )
+        if status_code != 200:
+            log.info(f"[READ] {status_code} {msg}")
+            return JSONResponse(content={"details": msg}, status_code=status_code)
+        log.info(f"[READ] 200 page {len(msg['rows'])} rows")  # type: ignore
+        return JSONResponse(
+            content={
+                "details": jsonable_encoder(msg["rows"]),  # type: ignore
+                "cursor": msg["cursor"],  # type: ignore
+            },
+            status_code=200,
+        )
     # process query
     status_code, msg = query_service.read_data(query.project_id, query.query)
     log.info(f"[READ] {status_code} {msg}")
     if status_code != 200:
-        return JSONResponse(content={"details": msg}, status_code=400)
+        return JSONResponse(content={"details": msg}, status_code=status_code)
 
     return JSONResponse(content={"details": jsonable_encoder(msg)}, status_code=200)
 
 
+@router.get("/cache")
+def get_cache_stats(user: UserModel = Depends(get_current_user)) -> JSONResponse:
+    stats = query_cache.get_stats()
+    log.info(f"[CACHE] 200 {stats}")
+    return JSONResponse(content={"details": stats}, status_code=200)
+
+
+@router.get("/cursors/{cursor}")
+def fetch_page(
+    cursor: str,
+    user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> JSONResponse:
+    query_service = QueryService(db, user)
+    status_code, msg = query_service.fetch_page(cursor)
+    if status_code != 200:
+        log.info(f"[FETCH] {status_code} {msg}")
+        return JSONResponse(content={"details": msg}, status_code=status_code)
+    log.info(f"[FETCH] 200 page {len(msg['rows'])} rows")  # type: ignore
+    return JSONResponse(
+        content={
+            "details": jsonable_encoder(msg["rows"]),  # type: ignore
+            "cursor": msg["cursor"],  # type: ignore
+        },
+        status_code=200,
+    )
+
+
+@router.delete("/cursors/{cursor}")
+def close_cursor(
+    cursor: str,
+    user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> JSONResponse:
+    query_service = QueryService(db, user)
+    status_code, msg = query_service.close_cursor(cursor)
+    log.info(f"[CLOSE CURSOR] {status_code} {msg}")
+    return JSONResponse(content={"details": msg}, status_code=status_code)
+
+
 @router.post("/write")
 def write_data(
     project_id: UUID = Form(),
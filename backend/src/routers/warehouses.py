@@ -63,8 +63,13 @@ def create_warehouse(
 
     wh_service = WarehouseService(db, user)
     status_code, msg = wh_service.create_warehouse(wh)
-    log.info(f"[CREATE] {status_code} {msg}")
-    return JSONResponse(content={"details": msg}, status_code=status_code)
+    # job id is returned to poll ingestion progress
+    content = {
+        "details": msg["message"],  # type: ignore
+        "job_id": str(msg["job_id"]),  # type: ignore
+    }
+    log.info(f"[CREATE] {status_code} {content}")
+    return JSONResponse(content=content, status_code=status_code)
 
 
 @router.put("/{wh_id}")
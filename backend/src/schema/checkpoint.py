@@ -0,0 +1,22 @@
+from enum import Enum
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class CheckpointState(str, Enum):
+    STAGED = "staged"
+    WRITTEN = "written"
+
+
+class CheckpointModel(BaseModel):
+    id: UUID
+    datatable_id: UUID
+    chunk: int
+    filepath: Optional[str]
+    state: CheckpointState
+    table_version: Optional[int]
+
+    class Config:
+        orm_mode = True
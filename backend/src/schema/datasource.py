@@ -64,6 +64,22 @@ class DatasourceCreate(BaseModel):
             if not check_host:
                 msg = "Host must be in format <host_url>:<port>/<databaseName>"
                 raise ValueError(msg)
+            # validate optional ingestion settings
+            for field in ["batch_size", "max_connections", "partitions"]:
+                if field in keys and not (v[field].isdecimal() and int(v[field]) > 0):
+                    msg = f"Config field '{field}' must be a positive integer"
+                    raise ValueError(msg)
+            # source tables can be read by Spark cluster over JDBC,
+            # Postgres tables can be streamed through a server-side cursor
+            if v.get("extraction", "api") not in ["api", "cursor", "jdbc"]:
+                msg = "Extraction must be one of 'api', 'cursor' or 'jdbc'"
+                raise ValueError(msg)
+            if v.get("extraction") == "cursor" and ds_type != DatasourceType.POSTGRESQL:
+                msg = "Cursor extraction is available for PostgreSQL only"
+                raise ValueError(msg)
+            if v.get("extraction") == "jdbc" and ds_type == DatasourceType.MONGODB:
+                msg = "JDBC extraction is available for MySQL and PostgreSQL only"
+                raise ValueError(msg)
         return v
 
     class Config:
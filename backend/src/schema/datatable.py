@@ -1,9 +1,16 @@
-from typing import Dict, List
+from enum import Enum
+from typing import Dict, List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel
 
 
+class WriteMode(str, Enum):
+    APPEND = "append"
+    OVERWRITE = "overwrite"
+    MERGE = "merge"
+
+
 class DataTableCreate(BaseModel):
     name: str
     datasource_id: UUID
@@ -15,6 +22,19 @@ class DataTableCreate(BaseModel):
 
 class DataTableModel(DataTableCreate):
     id: UUID
+    watermark_column: Optional[str] = None
+    watermark: Optional[str] = None
+    write_mode: WriteMode = WriteMode.APPEND
+    key_columns: Optional[List[str]] = None
+
+    class Config:
+        orm_mode = True
+
+
+class DataTableUpdate(BaseModel):
+    watermark_column: Optional[str]
+    write_mode: Optional[WriteMode]
+    key_columns: Optional[List[str]]
 
     class Config:
         orm_mode = True
@@ -0,0 +1,37 @@
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobModel(BaseModel):
+    id: UUID
+    warehouse_id: UUID
+    created_by: UUID
+    status: JobStatus
+    progress: Dict[str, Dict[str, str]]
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class JobUpdate(BaseModel):
+    status: Optional[JobStatus]
+    progress: Optional[Dict[str, Dict[str, str]]]
+    error: Optional[str]
+
+    class Config:
+        orm_mode = True
@@ -1,8 +1,11 @@
+from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PositiveInt
 
 
 class QueryModel(BaseModel):
     project_id: UUID
     query: str
+    # result is returned page by page through a cursor
+    page_size: Optional[PositiveInt]
@@ -9,10 +9,16 @@ from schema.datasource import (
     DatasourceType,
     DatasourceUpdate,
 )
-from schema.datatable import DataTableCreate, DataTableModel
+from schema.datatable import (
+    DataTableCreate,
+    DataTableModel,
+    DataTableUpdate,
+    WriteMode,
+)
 from schema.user import UserModel
 from sqlalchemy.orm import Session
-from utils.databases import TableInfo, get_tables
+from utils.databases import TableInfo
+from utils.introspection import get_tables_concurrently
 
 
 class DatasourceService:
@@ -25,25 +31,36 @@ class DatasourceService:
         columns: List[Dict[str, str]] = table["columns"]  # type: ignore
         return DataTableCreate(name=table_name, datasource_id=ds_id, columns=columns)
 
-    def __request_tables_from_ds(self, ds: DatasourceModel) -> List[DataTableCreate]:
-        if ds.ds_type == DatasourceType.DATATABLE:
-            columns: List[Dict[str, str]] = ds.config["columns"]  # type: ignore
-            table = DataTableCreate(name=ds.name, datasource_id=ds.id, columns=columns)
-            return [table]
-        else:
+    def __request_tables_from_ds(
+        self, datasources: List[DatasourceModel], refresh: bool = False
+    ) -> List[DataTableCreate]:
+        data_tables = []
+        db_datasources = []
+        sources = []
+        for ds in datasources:
+            if ds.ds_type == DatasourceType.DATATABLE:
+                columns: List[Dict[str, str]] = ds.config["columns"]  # type: ignore
+                table = DataTableCreate(
+                    name=ds.name, datasource_id=ds.id, columns=columns
+                )
+                data_tables.append(table)
+                continue
             url = (
                 f"{ds.ds_type.value}://"
                 + f"{ds.config['username']}:{ds.config['password']}@"
                 + f"{ds.config['host']}"
             )
-            tables = ds.config["tables"].split(",")
-            # get information about tables
-            db_tables_info = get_tables(url, tables)
-            # parse result
-            data_tables = list(
-                map(lambda e: self.__parse_to_datatable(ds.id, e), db_tables_info)
+            tables = [table.strip() for table in ds.config["tables"].split(",")]
+            db_datasources.append(ds)
+            sources.append((url, tables))
+        # get information about tables of all databases at once
+        db_tables_info = get_tables_concurrently(sources, refresh)
+        # parse result
+        for ds, tables_info in zip(db_datasources, db_tables_info):
+            data_tables.extend(
+                self.__parse_to_datatable(ds.id, table) for table in tables_info
             )
-            return data_tables
+        return data_tables
 
     def validate_user_access(self, ds_id: UUID) -> Tuple[int, str]:
         # check if datasource exists
@@ -73,7 +90,14 @@ class DatasourceService:
     def create_datasource(self, ds: DatasourceCreate) -> Tuple[int, str]:
         ds = ds_db.create_datasource(self.db, ds)
         # create tables in database
-        tables = self.__request_tables_from_ds(ds)
+        try:
+            tables = self.__request_tables_from_ds([ds])
+        except Exception as e:
+            # datasource isn't kept without its tables
+            ds_db.delete_datasource_by_id(self.db, ds.id)
+            if isinstance(e, TimeoutError):
+                return 504, "Datasource tables request timed out"
+            raise
         dt_db.create_tables(self.db, tables)
         return 200, f"Datasource(id={ds.id}) created, tables added"
 
@@ -84,10 +108,69 @@ class DatasourceService:
         if new_ds is None:
             return 400, "Bad request"
         # add or update datasource tables into database
-        tables = self.__request_tables_from_ds(new_ds)
+        try:
+            tables = self.__request_tables_from_ds([new_ds])
+        except TimeoutError:
+            return 504, "Datasource tables request timed out"
         dt_db.update_tables(self.db, tables)
         return 200, f"Datasource(id={ds_id}) columns updated"
 
+    def refresh_datasource(self, ds_id: UUID) -> Tuple[int, str]:
+        ds = ds_db.get_datasource_by_id(self.db, ds_id)
+        if ds is None:
+            return 400, "Bad request"
+        # bypass cached tables info
+        try:
+            tables = self.__request_tables_from_ds([ds], refresh=True)
+        except TimeoutError:
+            return 504, "Datasource tables request timed out"
+        dt_db.update_tables(self.db, tables)
+        return 200, f"Datasource(id={ds_id}) columns refreshed"
+
+    def refresh_project_datasources(self, project_id: UUID) -> Tuple[int, str]:
+        """
+        Refresh tables of every project datasource, databases are
+        requested concurrently
+        """
+        datasources = ds_db.get_project_datasources(self.db, project_id)
+        try:
+            tables = self.__request_tables_from_ds(datasources, refresh=True)
+        except TimeoutError:
+            return 504, "Datasource tables request timed out"
+        # tables are updated by datasource
+        for ds in datasources:
+            ds_tables = [table for table in tables if table.datasource_id == ds.id]
+            if ds_tables:
+                dt_db.update_tables(self.db, ds_tables)
+        return 200, f"Project(id={project_id}) datasources refreshed"
+
+    def update_datatable(
+        self, dt_id: UUID, new_data: DataTableUpdate
+    ) -> Tuple[int, str]:
+        table = dt_db.get_table_by_id(self.db, dt_id)
+        if table is None:
+            return 404, "Not found"
+        status_code, msg = self.validate_user_access(table.datasource_id)
+        if status_code != 200:
+            return status_code, msg
+        # validate resulting ingestion settings
+        column_names = [column["name"] for column in table.columns]
+        # fields set to null are cleared
+        new_fields = new_data.dict(exclude_unset=True)
+        watermark_column = new_fields.get("watermark_column", table.watermark_column)
+        write_mode = new_data.write_mode or table.write_mode
+        key_columns = new_fields.get("key_columns", table.key_columns) or []
+        if watermark_column is not None and watermark_column not in column_names:
+            return 400, "Watermark column must be one of the table columns"
+        if any(key not in column_names for key in key_columns):
+            return 400, "Key columns must be table columns"
+        if write_mode == WriteMode.MERGE and not key_columns:
+            return 400, "Merge mode requires key columns"
+        if write_mode == WriteMode.OVERWRITE and watermark_column is not None:
+            return 400, "Incremental tables can't be ingested in overwrite mode"
+        dt_db.update_table(self.db, dt_id, new_data)
+        return 200, f"DataTable(id={dt_id}) updated"
+
     def delete_datasource(self, ds_id: UUID) -> Tuple[int, str]:
         is_deleted = ds_db.delete_datasource_by_id(self.db, ds_id)
         if not is_deleted:
@@ -0,0 +1,43 @@
+from typing import Tuple
+from uuid import UUID
+
+from repos import jobs as job_db
+from schema.job import JobModel, JobStatus, JobUpdate
+from schema.user import UserModel
+from sqlalchemy.orm import Session
+from utils import jobs
+
+
+class JobService:
+    def __init__(self, db: Session, user: UserModel) -> None:
+        self.db = db
+        self.user = user
+
+    def validate_user_access(self, job_id: UUID) -> Tuple[int, str]:
+        # check if job exists
+        job = job_db.get_job_by_id(self.db, job_id)
+        if job is None:
+            return 404, "Not found"
+        # check user access
+        if job.created_by != self.user.id:
+            return 401, "Unauthorized"
+        return 200, "OK"
+
+    def get_job(self, job_id: UUID) -> Tuple[int, str | JobModel]:
+        job = job_db.get_job_by_id(self.db, job_id)
+        if job is None:
+            return 400, "Bad request"
+        return 200, job
+
+    def cancel_job(self, job_id: UUID) -> Tuple[int, str]:
+        job = job_db.get_job_by_id(self.db, job_id)
+        if job is None:
+            return 400, "Bad request"
+        if job.status not in [JobStatus.PENDING, JobStatus.RUNNING]:
+            return 400, f"Job(id={job_id}) is already {job.status.value}"
+        if not jobs.cancel(job_id):
+            # job isn't running in this process anymore
+            job_db.update_job(self.db, job_id, JobUpdate(status=JobStatus.CANCELLED))
+            return 200, f"Job(id={job_id}) cancelled"
+        # running tables finish, the job stops before the next ones
+        return 202, f"Job(id={job_id}) cancellation requested"
@@ -1,8 +1,13 @@
-from typing import Dict, List, Tuple
+import json
+from threading import Event
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 from uuid import UUID
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import structlog
+import utils.databases as db_utils
 import utils.spark_helpers as spk
 from fastapi import UploadFile
 from repos import datasources as ds_db
@@ -14,11 +19,16 @@ from schema.project import ProjectModel
 from schema.user import UserModel
 from schema.warehouseDatatable import WarehouseDataTableCreate
 from sqlalchemy.orm import Session
+from utils import cursors, query_cache
+from utils.checkpoints import Checkpointer
+from utils.settings import settings
 
 from .project import ProjectService
 
 log = structlog.get_logger(module=__name__)
 
+ARROW_FORMATS = ["parquet", "arrow", "feather", "ipc"]
+
 
 class QueryService:
     def __init__(self, db: Session, user: UserModel) -> None:
@@ -50,10 +60,38 @@ class QueryService:
             result.append((ds, data[str(ds.id)]))  # type: ignore
         return result
 
+    def __read_file_chunks(self, file: UploadFile) -> Iterator[pd.DataFrame]:
+        chunk_size = settings.UPLOAD_CHUNK_SIZE
+        file_format = file.filename.split(".")[-1].lower()
+        if file_format == "jsonl":
+            yield from pd.read_json(file.file, lines=True, chunksize=chunk_size)
+        elif file_format == "json":
+            # JSON document can't be split, it is read at once
+            yield pd.read_json(file.file)
+        else:
+            yield from pd.read_csv(file.file, chunksize=chunk_size)
+
+    def __read_arrow_file(
+        self, file: UploadFile
+    ) -> Tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+        file_format = file.filename.split(".")[-1].lower()
+        if file_format == "parquet":
+            parquet_file = pq.ParquetFile(file.file)
+            batches = parquet_file.iter_batches(batch_size=settings.UPLOAD_CHUNK_SIZE)
+            return parquet_file.schema_arrow, batches
+        # Feather v2 is Arrow IPC file format
+        reader = pa.ipc.open_file(file.file)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        return reader.schema, batches
+
     def validate_file(self, file: UploadFile) -> Tuple[int, str]:
-        file_type = file.filename.split(".")[-1]
-        if file_type not in ["csv", "json"]:
-            return 400, "Invalid file format. Only CSV and JSON formats are available."
+        file_type = file.filename.split(".")[-1].lower()
+        if file_type not in ["csv", "json", "jsonl"] + ARROW_FORMATS:
+            return (
+                400,
+                "Invalid file format. Only CSV, JSON, JSON Lines, Parquet "
+                + "and Arrow IPC formats are available.",
+            )
         return 200, "OK"
 
     def validate_query(self, project_id: UUID, query: str) -> Tuple[int, str]:
@@ -62,7 +100,7 @@ class QueryService:
         on node without executing it
 
         EFFECTS:
-        * creates spark session
+        * leases spark session
         """
         proj = proj_db.get_project_by_id(self.db, project_id)
         # validate user access
@@ -71,36 +109,42 @@ class QueryService:
         if status_code != 200:
             return 400, msg
         node_url = proj.node_url  # type: ignore
-        # create spark session
-        spark_session = spk.setup_connection(node_url)
-        # check query
+        # lease spark session
         try:
-            spark_session.sql(f"EXPLAIN {query}")
-            return 200, "OK"
-        except Exception as e:
-            return 400, str(e)
-        finally:
-            spark_session.stop()
+            with spk.spark_session(node_url) as spark_session:
+                # check query
+                try:
+                    spark_session.sql(f"EXPLAIN {query}")
+                    return 200, "OK"
+                except Exception as e:
+                    return 400, str(e)
+        except TimeoutError as e:
+            # every pooled session is leased
+            return 503, str(e)
 
     def run_query(self, project_id: UUID, query: str):
         """
         Run user query
 
         EFFECTS:
-        * creates spark session
+        * leases spark session
         """
         node_url = self.__get_node_url(project_id)
-        # create spark session
-        spark_session = spk.setup_connection(node_url)
+        # lease spark session
         try:
-            res = spk.run_query(spark_session, query)
-            return True, res
-        except Exception as e:
+            with spk.spark_session(node_url) as spark_session:
+                try:
+                    res = spk.run_query(spark_session, query)
+                    return True, res
+                except Exception as e:
+                    return False, str(e)
+        except TimeoutError as e:
+            # every pooled session is leased
             return False, str(e)
-        finally:
-            spark_session.stop()
 
-    def add_tables(self, tables: List[WarehouseDataTableCreate]) -> Tuple[bool, str]:
+    def add_tables(
+        self, tables: List[WarehouseDataTableCreate], cancelled: Event | None = None
+    ) -> Tuple[bool, str]:
         # get node_url
         proj: ProjectModel = proj_db.get_project_by_wh_id(
             self.db, tables[0].warehouse_id
@@ -110,24 +154,33 @@ class QueryService:
         datatables: List[DataTableModel] = [
             dt_db.get_table_by_id(self.db, wh_dt.datatable_id) for wh_dt in tables
         ]  # type: ignore
-        spark_session = spk.setup_connection(node_url)
         try:
-            for table in datatables:
-                spk.create_table(spark_session, table.name, table.columns)  # type: ignore
-            return True, "Tables created"
-        except Exception as e:
+            with spk.spark_session(node_url) as spark_session:
+                try:
+                    for table in datatables:
+                        if cancelled is not None and cancelled.is_set():
+                            return False, "Cancelled"
+                        spk.create_table(spark_session, table.name, table.columns)  # type: ignore
+                    return True, "Tables created"
+                except Exception as e:
+                    return False, str(e)
+        except TimeoutError as e:
+            # every pooled session is leased
             return False, str(e)
-        finally:
-            spark_session.stop()
 
     def ingest_data(
-        self, project_id: UUID, tables: List[WarehouseDataTableCreate]
+        self,
+        project_id: UUID,
+        tables: List[WarehouseDataTableCreate],
+        cancelled: Event | None = None,
+        on_result: Callable[[spk.TableIngestResult], None] | None = None,
     ) -> Tuple[bool, str]:
         """
-        Ingest data from warehouse tables to spark cluster
+        Ingest data from warehouse tables to spark cluster,
+        tables not started yet are skipped once `cancelled` is set
 
         EFFECTS:
-        * creates spark session
+        * leases spark session
         """
         node_url = self.__get_node_url(project_id)
         # select datatables
@@ -139,34 +192,180 @@ class QueryService:
         datasources = ds_db.get_datasources_by_id(self.db, list(grouped.keys()))
         ds_grouped = self.__add_datasource(grouped, datasources)
         # run spark queries
-        spark_session = spk.setup_connection(node_url)
+        ds_grouped = [
+            (ds, dstables)
+            for ds, dstables in ds_grouped
+            if ds.ds_type.value != "datatable"
+        ]
         try:
-            for ds, dstables in ds_grouped:
-                if ds.ds_type.value == "datatable":
-                    continue
-                spk.ingest_data(spark_session, ds, dstables)
-            return True, "Data from tables ingested"
-        except Exception as e:
+            with spk.spark_session(node_url) as spark_session:
+                try:
+                    # chunks written by a failed run are skipped
+                    checkpoints = Checkpointer()
+                    results = spk.ingest_datasources(
+                        spark_session, ds_grouped, cancelled, on_result, checkpoints
+                    )
+                    for res in results:
+                        log.info(f"[INGEST] {res['table_name']} {res['details']}")
+                    failed = [
+                        f"{res['table_name']}: {res['details']}"
+                        for res in results
+                        if not res["status"]
+                    ]
+                    if failed:
+                        return False, "; ".join(failed)
+                    return True, "Data from tables ingested"
+                except Exception as e:
+                    return False, str(e)
+        except TimeoutError as e:
+            # every pooled session is leased
             return False, str(e)
-        finally:
-            spark_session.stop()
+
+    def __stream_ndjson(self, node_url: str, query: str) -> Iterator[bytes]:
+        try:
+            with spk.spark_session(node_url) as spark_session:
+                try:
+                    for rows in spk.iter_query_rows(spark_session, query):
+                        yield spk.to_ndjson(rows)
+                except Exception as e:
+                    # response status is already sent, error ends the stream
+                    yield (json.dumps({"error": str(e)}) + "\n").encode()
+        except TimeoutError as e:
+            # every pooled session is leased
+            yield (json.dumps({"error": str(e)}) + "\n").encode()
+
+    def stream_data(self, project_id: UUID, query: str) -> Iterator[bytes]:
+        """
+        Stream query result as NDJSON, rows are encoded batch by batch
+        EFFECTS:
+        * leases spark session until the stream is consumed
+        """
+        node_url = self.__get_node_url(project_id)
+        return self.__stream_ndjson(node_url, query)
+
+    def read_arrow(
+        self, project_id: UUID, query: str
+    ) -> Tuple[int, str | Iterator[bytes]]:
+        """
+        Read data from the spark cluster as Arrow IPC stream
+        EFFECTS:
+        * leases spark session until the result is fetched
+        """
+        node_url = self.__get_node_url(project_id)
+        try:
+            with spk.spark_session(node_url) as spark_session:
+                try:
+                    table = spk.query_to_arrow(spark_session, query)
+                except Exception as e:
+                    return 400, str(e)
+        except TimeoutError as e:
+            # every pooled session is leased
+            return 503, str(e)
+        return 200, spk.to_arrow_stream(table)
+
+    def read_page(
+        self, project_id: UUID, query: str, page_size: int
+    ) -> Tuple[int, str | Dict[str, Any]]:
+        """
+        Run query once and return the first page of its result
+        with a cursor to the next ones
+        EFFECTS:
+        * leases spark session
+        * spills result to a file until the cursor expires
+        """
+        node_url = self.__get_node_url(project_id)
+        try:
+            with spk.spark_session(node_url) as spark_session:
+                try:
+                    table = spk.query_to_arrow(spark_session, query)
+                except Exception as e:
+                    return 400, str(e)
+        except TimeoutError as e:
+            # every pooled session is leased
+            return 503, str(e)
+        token = cursors.create_cursor(table, self.user.id, page_size)
+        return self.fetch_page(token)
+
+    def fetch_page(self, token: str) -> Tuple[int, str | Dict[str, Any]]:
+        page = cursors.fetch_page(token, self.user.id)
+        if page is None:
+            return 404, "Cursor not found or expired"
+        rows, next_token = page
+        # NaN and infinity aren't valid JSON
+        return 200, {"rows": spk.to_finite(rows), "cursor": next_token}
+
+    def close_cursor(self, token: str) -> Tuple[int, str]:
+        if not cursors.close_cursor(token, self.user.id):
+            return 404, "Cursor not found or expired"
+        return 200, "Cursor closed"
+
+    def __get_table_versions(
+        self, node_url: str, tables: List[str]
+    ) -> Dict[str, int] | None:
+        """
+        Get current Delta versions of tables, None if any can't be read
+
+        EFFECTS:
+        * leases spark session
+        """
+        try:
+            with spk.spark_session(node_url) as spark_session:
+                try:
+                    return spk.get_table_versions(spark_session, tables)
+                except Exception:
+                    return None
+        except TimeoutError:
+            # every pooled session is leased
+            return None
+
+    def get_cached_result(self, project_id: UUID, query: str) -> List[Any] | None:
+        """
+        Get result of a query read before, if none of its tables
+        has been written since
+
+        EFFECTS:
+        * leases spark session if the query is cached
+        """
+        node_url = self.__get_node_url(project_id)
+        normalized = query_cache.normalize_query(query)
+        return query_cache.get(
+            node_url,
+            normalized,
+            lambda tables: self.__get_table_versions(node_url, tables),
+        )
 
     def read_data(self, project_id: UUID, query: str):
         """
-        Read data from the spark cluster
+        Read data from the spark cluster, result is cached
+        by the query and versions of its tables
         EFFECTS:
-        * creates spark session
+        * leases spark session
         """
         node_url = self.__get_node_url(project_id)
+        normalized = query_cache.normalize_query(query)
+        table_names = dt_db.get_project_table_names(self.db, project_id)
+        # None for queries which result can't be cached
+        tables = query_cache.find_tables(normalized, table_names)
+        versions = None
         # run spark queries
-        spark_session = spk.setup_connection(node_url)
         try:
-            data = spk.run_query(spark_session, query)
-            return 200, data
-        except Exception as e:
-            return 400, str(e)
-        finally:
-            spark_session.stop()
+            with spk.spark_session(node_url) as spark_session:
+                try:
+                    if tables is not None:
+                        # versions are taken first, a later commit makes entry stale
+                        try:
+                            versions = spk.get_table_versions(spark_session, tables)
+                        except Exception:
+                            versions = None
+                    data = spk.run_query(spark_session, query)
+                except Exception as e:
+                    return 400, str(e)
+        except TimeoutError as e:
+            # every pooled session is leased
+            return 503, str(e)
+        if versions is not None:
+            query_cache.put(node_url, normalized, versions, data)
+        return 200, data
 
     def write_data(
         self, project_id: UUID, datatable_id: UUID, file: UploadFile | None = None
@@ -174,17 +373,9 @@ class QueryService:
         """
         Write data to the spark cluster
         EFFECTS:
-        * creates spark session
+        * leases spark session
         """
         node_url = self.__get_node_url(project_id)
-        # read data from file
-        df = pd.DataFrame([])
-        if file is not None:
-            file_format = file.filename.split(".")[-1]
-            if file_format.lower() == "json":
-                df = pd.read_json(file.file)
-            else:
-                df = pd.read_csv(file.file)
         # get table info
         table = dt_db.get_table_by_id(self.db, datatable_id)
         if table is None:
@@ -192,15 +383,46 @@ class QueryService:
         ds: DatasourceModel = ds_db.get_datasource_by_id(
             self.db, table.datasource_id
         )  # type: ignore
+        chunks: Iterator[pd.DataFrame] = iter([])
+        if file is not None:
+            file_format = file.filename.split(".")[-1].lower()
+            if file_format in ARROW_FORMATS:
+                # typed files are checked against the table by metadata
+                try:
+                    schema, batches = self.__read_arrow_file(file)
+                except pa.ArrowInvalid as e:
+                    return 400, str(e)
+                error = db_utils.validate_arrow_schema(schema, table.columns)
+                if error is not None:
+                    return 400, error
+                chunks = db_utils.arrow_batches_to_frames(batches, table.columns)
+            else:
+                chunks = self.__read_file_chunks(file)
         # run spark queries
-        spark_session = spk.setup_connection(node_url)
         try:
-            if file is None:
-                spk.ingest_data(spark_session, ds, [table])
-            else:
-                spk.ingest_from_file(spark_session, df, table.columns, table.name)
-            return 200, "Data is written"
-        except Exception as e:
-            return 400, str(e)
-        finally:
-            spark_session.stop()
+            with spk.spark_session(node_url) as spark_session:
+                try:
+                    if file is None:
+                        checkpoints = Checkpointer()
+                        res = spk.ingest_data(spark_session, ds, [table], checkpoints)[
+                            0
+                        ]
+                        if not res["status"]:
+                            return 400, res["details"]
+                    else:
+                        # upload is staged chunk by chunk and written at once
+                        stats = spk.ingest_chunks(
+                            spark_session,
+                            chunks,
+                            table.columns,
+                            table.name,
+                            table.write_mode.value,
+                            table.key_columns,
+                        )
+                        log.info(f"[WRITE] {table.name} {spk.format_stats(stats)}")
+                    return 200, "Data is written"
+                except Exception as e:
+                    return 400, str(e)
+        except TimeoutError as e:
+            # every pooled session is leased
+            return 503, str(e)
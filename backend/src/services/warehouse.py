@@ -1,9 +1,13 @@
-from typing import Dict, List, Tuple
+from threading import Event
+from typing import Any, Callable, Dict, List, Tuple
 from uuid import UUID
 
 import structlog
 from repos import datatables as dt_db
+from repos import jobs as job_db
 from repos import warehouses as wh_db
+from repos.database import SessionLocal
+from schema.job import JobStatus, JobUpdate
 from schema.user import UserModel
 from schema.warehouse import WarehouseCreate, WarehouseModel, WarehouseUpdate
 from schema.warehouseDatatable import (
@@ -13,6 +17,8 @@ from schema.warehouseDatatable import (
 )
 from services.query import QueryService
 from sqlalchemy.orm import Session
+from utils import jobs
+from utils.spark_helpers import TableIngestResult
 
 log = structlog.get_logger(module=__name__)
 
@@ -38,17 +44,23 @@ class WarehouseService:
         return tables
 
     def __add_datatables(
-        self, wh: WarehouseModel, dts: Dict[str, List[UUID]]
+        self,
+        wh: WarehouseModel,
+        dts: Dict[str, List[UUID]],
+        cancelled: Event | None = None,
+        on_result: Callable[[TableIngestResult], None] | None = None,
     ) -> Tuple[bool, str | List[WarehouseDataTableModel]]:
         tables = self.__parse_datatables(wh, dts)
         # add tables to spark cluster
         query_service = QueryService(self.db, self.user)
-        status, msg = query_service.add_tables(tables)
+        status, msg = query_service.add_tables(tables, cancelled)
         if not status:
             return False, msg
         log.info("[DWH CREATE] Tables added to Spark cluster")
         # ingest data from the tables
-        status, msg = query_service.ingest_data(wh.project_id, tables)
+        status, msg = query_service.ingest_data(
+            wh.project_id, tables, cancelled, on_result
+        )
         if not status:
             return False, msg
         log.info("[DWH CREATE] Data ingested to Spark cluster")
@@ -80,12 +92,74 @@ class WarehouseService:
             return 400, "Bad request"
         return 200, wh
 
-    def create_warehouse(self, wh: WarehouseCreate) -> Tuple[int, str]:
+    def run_create_job(
+        self, job_id: UUID, wh: WarehouseModel, cancelled: Event
+    ) -> None:
+        """
+        Create warehouse tables and ingest their data, tracking progress
+        of every table in the job
+        """
+        if cancelled.is_set():
+            job_db.update_job(self.db, job_id, JobUpdate(status=JobStatus.CANCELLED))
+            return
+        dt_ids = [dt_id for dt_ids in wh.datatables.values() for dt_id in dt_ids]
+        # tables of different datasources may share a name
+        progress = {
+            str(dt_id): {
+                "name": dt_db.get_table_by_id(self.db, dt_id).name,  # type: ignore
+                "status": "pending",
+                "details": "",
+            }
+            for dt_id in dt_ids
+        }
+        job_db.update_job(
+            self.db, job_id, JobUpdate(status=JobStatus.RUNNING, progress=progress)
+        )
+
+        def save_progress(res: TableIngestResult):
+            status = "ingested" if res["status"] else "failed"
+            if res["details"] == "Cancelled":
+                status = "cancelled"
+            progress[str(res["table_id"])].update(status=status, details=res["details"])
+            job_db.update_job(self.db, job_id, JobUpdate(progress=progress))
+
+        status, msg = self.__add_datatables(wh, wh.datatables, cancelled, save_progress)
+        if status:
+            job_db.update_job(self.db, job_id, JobUpdate(status=JobStatus.SUCCEEDED))
+        elif cancelled.is_set():
+            job_db.update_job(
+                self.db, job_id, JobUpdate(status=JobStatus.CANCELLED, error=msg)
+            )
+        else:
+            job_db.update_job(
+                self.db, job_id, JobUpdate(status=JobStatus.FAILED, error=msg)
+            )
+        log.info(f"[JOB] {job_id} {msg if not status else 'succeeded'}")
+
+    def create_warehouse(self, wh: WarehouseCreate) -> Tuple[int, str | Dict[str, Any]]:
         created_wh = wh_db.create_warehouse(self.db, wh)
-        status, msg = self.__add_datatables(created_wh, wh.datatables)
-        if not status:
-            return 400, msg  # type: ignore
-        return 200, f"Warehouse(id={created_wh.id}) created"
+        job = job_db.create_job(self.db, created_wh.id, self.user.id)
+        user = self.user
+
+        # tables are created and ingested in background with its own session
+        def run(cancelled: Event):
+            db = SessionLocal()
+            try:
+                WarehouseService(db, user).run_create_job(job.id, created_wh, cancelled)
+            except Exception as e:
+                db.rollback()
+                job_db.update_job(
+                    db, job.id, JobUpdate(status=JobStatus.FAILED, error=str(e))
+                )
+                raise
+            finally:
+                db.close()
+
+        jobs.submit(job.id, run)
+        return 202, {
+            "message": f"Warehouse(id={created_wh.id}) created, job started",
+            "job_id": job.id,
+        }
 
     def update_warehouse(
         self, wh_id: UUID, new_data: WarehouseUpdate
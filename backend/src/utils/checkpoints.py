@@ -0,0 +1,59 @@
+import os
+from threading import Lock
+from typing import List, Set
+from uuid import UUID
+
+from repos import checkpoints as cp_db
+from repos.database import SessionLocal
+from schema.checkpoint import CheckpointModel, CheckpointState
+
+# tables being ingested by a run of this process
+active_tables: Set[UUID] = set()
+active_tables_lock = Lock()
+
+
+class Checkpointer:
+    """
+    Progress of an ingestion run by table and chunk, stored in the metadata
+    database. Every call uses its own session, so tables ingested
+    in parallel threads can share one instance
+    """
+
+    def claim(self, dt_id: UUID) -> bool:
+        """
+        Reserve a table for the run, so concurrent runs don't share
+        its checkpoints
+        """
+        with active_tables_lock:
+            if dt_id in active_tables:
+                return False
+            active_tables.add(dt_id)
+            return True
+
+    def release(self, dt_id: UUID):
+        with active_tables_lock:
+            active_tables.discard(dt_id)
+
+    def get(self, dt_id: UUID) -> List[CheckpointModel]:
+        with SessionLocal() as db:
+            return cp_db.get_table_checkpoints(db, dt_id)
+
+    def stage(self, dt_id: UUID, filepaths: List[str], table_version: int | None):
+        with SessionLocal() as db:
+            cp_db.create_checkpoints(db, dt_id, filepaths, table_version)
+
+    def mark_written(self, dt_id: UUID, chunk: int):
+        with SessionLocal() as db:
+            cp_db.set_chunk_state(db, dt_id, chunk, CheckpointState.WRITTEN)
+
+    def commit(self, dt_id: UUID, watermark: str | None):
+        """
+        Save the new watermark of an ingested table and drop its checkpoints
+        """
+        with SessionLocal() as db:
+            checkpoints = cp_db.get_table_checkpoints(db, dt_id)
+            cp_db.commit_table(db, dt_id, watermark)
+        # staged files aren't needed after commit
+        for checkpoint in checkpoints:
+            if checkpoint.filepath is not None and os.path.exists(checkpoint.filepath):
+                os.unlink(checkpoint.filepath)
@@ -0,0 +1,147 @@
+import os
+import secrets
+import time
+from threading import Lock
+from typing import Any, Dict, List, Tuple, TypedDict
+from uuid import UUID
+
+import pyarrow as pa
+
+from .databases import get_tmp_filepath
+from .settings import settings
+
+
+class CursorInfo(TypedDict):
+    filepath: str
+    owner: UUID
+    page_size: int
+    num_rows: int
+    expires_at: float
+    # pages being read, the file is removed once the last read ends
+    readers: int
+    closed: bool
+
+
+# query results spilled to Arrow files by cursor id
+cursors: Dict[str, CursorInfo] = {}
+cursors_lock = Lock()
+
+
+def _remove_file(filepath: str):
+    if os.path.exists(filepath):
+        os.unlink(filepath)
+
+
+def _release(cursor: CursorInfo) -> str | None:
+    """
+    Mark cursor closed, return its file path when no page is being read
+    """
+    cursor["closed"] = True
+    return cursor["filepath"] if cursor["readers"] == 0 else None
+
+
+def to_token(cursor_id: str, page: int) -> str:
+    return f"{cursor_id}.{page}"
+
+
+def parse_token(token: str) -> Tuple[str, int] | None:
+    cursor_id, _, page = token.rpartition(".")
+    if not cursor_id or not page.isdigit():
+        return None
+    return cursor_id, int(page)
+
+
+def evict_expired():
+    now = time.monotonic()
+    with cursors_lock:
+        expired = [key for key, c in cursors.items() if c["expires_at"] < now]
+        filepaths = [_release(cursors.pop(key)) for key in expired]
+    for filepath in filepaths:
+        if filepath is not None:
+            _remove_file(filepath)
+
+
+def create_cursor(table: pa.Table, owner: UUID, page_size: int) -> str:
+    """
+    Spill query result to a file, return a token of its first page.
+    Every page has its own token, so fetching a page can be repeated
+    """
+    evict_expired()
+    filepath = get_tmp_filepath("arrow")
+    with pa.OSFile(filepath, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    cursor_id = secrets.token_urlsafe(24)
+    with cursors_lock:
+        cursors[cursor_id] = {
+            "filepath": filepath,
+            "owner": owner,
+            "page_size": page_size,
+            "num_rows": table.num_rows,
+            "expires_at": time.monotonic() + settings.CURSOR_TTL,
+            "readers": 0,
+            "closed": False,
+        }
+    return to_token(cursor_id, 0)
+
+
+def fetch_page(
+    token: str, owner: UUID
+) -> Tuple[List[Dict[str, Any]], str | None] | None:
+    """
+    Read the page of a token, return its rows and the token
+    of the next page, if any rows are left
+    """
+    evict_expired()
+    parsed = parse_token(token)
+    if parsed is None:
+        return None
+    cursor_id, page = parsed
+    with cursors_lock:
+        cursor = cursors.get(cursor_id)
+        if cursor is None or cursor["owner"] != owner:
+            return None
+        offset = page * cursor["page_size"]
+        if offset > 0 and offset >= cursor["num_rows"]:
+            return None
+        # every fetch extends cursor lifetime
+        cursor["expires_at"] = time.monotonic() + settings.CURSOR_TTL
+        # file is kept until the page is read, even if the cursor is closed
+        cursor["readers"] += 1
+    try:
+        # memory-mapped file, only the requested rows are read
+        with pa.memory_map(cursor["filepath"]) as source:
+            table = pa.ipc.open_file(source).read_all()
+            rows = table.slice(offset, cursor["page_size"]).to_pylist()
+    finally:
+        with cursors_lock:
+            cursor["readers"] -= 1
+            is_last_read = cursor["closed"] and cursor["readers"] == 0
+        if is_last_read:
+            _remove_file(cursor["filepath"])
+    has_more = offset + cursor["page_size"] < cursor["num_rows"]
+    return rows, to_token(cursor_id, page + 1) if has_more else None
+
+
+def close_cursor(token: str, owner: UUID) -> bool:
+    parsed = parse_token(token)
+    if parsed is None:
+        return False
+    cursor_id, _ = parsed
+    with cursors_lock:
+        cursor = cursors.get(cursor_id)
+        if cursor is None or cursor["owner"] != owner:
+            return False
+        filepath = _release(cursors.pop(cursor_id))
+    if filepath is not None:
+        _remove_file(filepath)
+    return True
+
+
+def close_all():
+    with cursors_lock:
+        filepaths = [_release(cursor) for cursor in cursors.values()]
+        cursors.clear()
+    for filepath in filepaths:
+        if filepath is not None:
+            _remove_file(filepath)
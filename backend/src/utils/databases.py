@@ -1,15 +1,45 @@
 import json
 import os
+import time
 import uuid
-from typing import Dict, List, Tuple, TypedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    TypedDict,
+)
 from urllib.parse import urlparse
 
 import mysql.connector
 import pandas as pd
 import psycopg2
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from bson import Decimal128
+from cachetools import TTLCache
+from pandas.api.types import infer_dtype
 from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.errors import ExecutionTimeout
 from schema.datatable import DataTableModel
 
+from . import pools
+from .settings import settings
+
 
 class ColumnInfo(TypedDict):
     name: str
@@ -25,6 +55,26 @@ def create_postgres_connection(url: str):
     return psycopg2.connect(url)
 
 
+def is_postgres_alive(conn) -> bool:
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def postgres_connection(url: str) -> ContextManager:
+    """
+    Lease a pooled connection, open transaction is rolled back on return
+    """
+    pool = pools.get_pool(
+        url, create_postgres_connection, is_postgres_alive, lambda c: c.rollback()
+    )
+    return pool.connection()
+
+
 def parse_mysql_url(url: str) -> Dict[str, str]:
     parsed_url = urlparse(url)
     username = parsed_url.username
@@ -47,6 +97,19 @@ def create_mysql_connection(url: str):
     return mysql.connector.connect(**parse_mysql_url(url))
 
 
+def mysql_connection(url: str) -> ContextManager:
+    """
+    Lease a pooled connection, open transaction is rolled back on return
+    """
+    pool = pools.get_pool(
+        url,
+        create_mysql_connection,
+        lambda c: c.is_connected(),
+        lambda c: c.rollback(),
+    )
+    return pool.connection()
+
+
 def parse_mongodb_url(url: str) -> Tuple[str, str]:
     db_name = url.split("/")[-1]
     url = url.split(db_name)[0][:-1]
@@ -56,14 +119,27 @@ def parse_mongodb_url(url: str) -> Tuple[str, str]:
 def create_mongodb_connection(url: str):
     url, db_name = parse_mongodb_url(url)
     # establish connection
-    client = MongoClient(url)
+    client = MongoClient(
+        url,
+        maxPoolSize=settings.SOURCE_POOL_MAX_SIZE,
+        maxIdleTimeMS=settings.SOURCE_POOL_IDLE_TIMEOUT * 1000,
+    )
+    return client, db_name
+
+
+def get_mongodb_connection(url: str):
+    """
+    Get shared client, MongoClient pools and monitors connections itself
+    """
+    client = pools.get_client(url, lambda u: create_mongodb_connection(u)[0])
+    _, db_name = parse_mongodb_url(url)
     return client, db_name
 
 
 def parse_data_type_mongodb(data_type: str) -> str:
     mapping = {
         "int": "int",
-        "long": "int",
+        "long": "bigint",
         "double": "float",
         "float": "float",
         "decimal": "float",
@@ -80,13 +156,16 @@ def parse_data_type_mysql(data_type: str) -> str:
         "tinyint": "bool",
         "smallint": "int",
         "mediumint": "int",
-        "bigint": "int",
+        "bigint": "bigint",
         "float": "float",
         "double": "float",
         "decimal": "float",
         "char": "str",
         "varchar": "str",
         "text": "str",
+        "date": "str",
+        "datetime": "str",
+        "timestamp": "str",
     }
     return mapping[data_type.lower()]
 
@@ -94,7 +173,7 @@ def parse_data_type_mysql(data_type: str) -> str:
 def parse_data_type_postgres(data_type: str) -> str:
     mapping = {
         "integer": "int",
-        "bigint": "int",
+        "bigint": "bigint",
         "smallint": "int",
         "decimal": "float",
         "numeric": "float",
@@ -104,116 +183,186 @@ def parse_data_type_postgres(data_type: str) -> str:
         "character varying": "str",
         "text": "str",
         "boolean": "bool",
+        "date": "str",
+        "timestamp without time zone": "str",
+        "timestamp with time zone": "str",
     }
     return mapping[data_type.lower()]
 
 
 def get_postgres_tables(url: str) -> List[str]:
-    conn = create_postgres_connection(url)
     # establish connection
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'"
-    )
-    tables = cursor.fetchall()
-    # close connection
-    cursor.close()
-    conn.close()
+    with postgres_connection(url) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT table_name FROM information_schema.tables "
+            + "WHERE table_schema = 'public'"
+        )
+        tables = cursor.fetchall()
+        cursor.close()
     return [table[0] for table in tables]
 
 
-def get_postgres_tables_info(
-    url: str, tables: List[str]
-) -> List[Dict[str, str | List[Dict[str, str]]]]:
-    table_info = []
+def group_columns(
+    tables: List[str], rows: List[Tuple[str, str, Any]], parse_type: Callable
+) -> List[TableInfo]:
+    """
+    Group (table, column, type) rows by table in order of requested tables
+    """
+    grouped: Dict[str, List[ColumnInfo]] = {table: [] for table in tables}
+    for table_name, column_name, data_type in rows:
+        if isinstance(data_type, bytes):
+            data_type = data_type.decode("utf-8")
+        column: ColumnInfo = {"name": column_name, "type": parse_type(data_type)}
+        grouped.setdefault(table_name, []).append(column)
+    return [
+        {"table_name": table_name, "columns": columns}
+        for table_name, columns in grouped.items()
+    ]
+
+
+def get_postgres_tables_info(url: str, tables: List[str]) -> List[TableInfo]:
     # establish connection
-    conn = create_postgres_connection(url)
-    cursor = conn.cursor()
-    for table_name in tables:
+    with postgres_connection(url) as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            f"""
-            SELECT column_name, data_type FROM information_schema.columns
-            WHERE table_name = '{table_name}';
             """
+            SELECT table_name, column_name, data_type FROM information_schema.columns
+            WHERE table_name = ANY(%s)
+            ORDER BY table_name, ordinal_position;
+            """,
+            (tables,),
         )
         columns = cursor.fetchall()
-        column_info = [
-            {"name": column[0], "type": parse_data_type_postgres(column[1])}
-            for column in columns
-        ]
-        table_info.append({"table_name": table_name, "columns": column_info})
-    # close connection
-    cursor.close()
-    conn.close()
-    return table_info
+        cursor.close()
+    return group_columns(tables, columns, parse_data_type_postgres)
 
 
 def get_mysql_tables(url: str) -> List[str]:
     # establish connection
-    conn = create_mysql_connection(url)
-    cursor = conn.cursor()
-    cursor.execute("SHOW TABLES")
-    tables = cursor.fetchall()
-    # close connection
-    cursor.close()
-    conn.close()
+    with mysql_connection(url) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SHOW TABLES")
+        tables = cursor.fetchall()
+        cursor.close()
     return [table for table in tables]  # type: ignore
 
 
-def get_mysql_tables_info(url: str, tables: List[str]):
-    table_info = []
+def get_mysql_tables_info(url: str, tables: List[str]) -> List[TableInfo]:
+    placeholders = ",".join(["%s"] * len(tables))
     # establish connection
-    conn = create_mysql_connection(url)
-    cursor = conn.cursor()
-    for table in tables:
-        cursor.execute(f"SHOW COLUMNS FROM {table};")
+    with mysql_connection(url) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT table_name, column_name, column_type FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name IN ({placeholders})
+            ORDER BY table_name, ordinal_position;
+            """,
+            tuple(tables),
+        )
         columns = cursor.fetchall()
-        # parse results
-        column_info = [
-            {
-                "name": column[0],
-                "type": parse_data_type_mysql(column[1].decode("utf-8")),  # type: ignore
-            }
-            for column in columns
-        ]
-        table_info.append({"table_name": table, "columns": column_info})
-    # close connection
-    cursor.close()
-    conn.close()
-    return table_info
+        cursor.close()
+    return group_columns(tables, columns, parse_data_type_mysql)  # type: ignore
 
 
 def get_mongodb_tables(url: str):
     # establish connection
-    client, db_name = create_mongodb_connection(url)
+    client, db_name = get_mongodb_connection(url)
     db = client[db_name]
     tables = db.list_collection_names()
-    # close connection
-    client.close()
     return tables
 
 
-def get_mongodb_tables_info(url: str, colls: List[str]):
+def sample_mongodb_documents(collection: Collection) -> List[Dict[str, Any]]:
+    """
+    Get random documents of a collection, bounded by sample size
+    and time budget
+    """
+    sample_size = settings.MONGODB_SAMPLE_SIZE
+    time_budget = settings.MONGODB_SAMPLE_TIME_MS
+    deadline = time.monotonic() + time_budget / 1000
+    try:
+        cursor = collection.aggregate(
+            [{"$sample": {"size": sample_size}}, {"$project": {"_id": 0}}],
+            maxTimeMS=time_budget,
+        )
+    except ExecutionTimeout:
+        # fall back to the first documents
+        cursor = collection.find(
+            {}, {"_id": 0}, limit=sample_size, max_time_ms=time_budget
+        )
+    documents = []
+    try:
+        for document in cursor:
+            documents.append(document)
+            if time.monotonic() > deadline:
+                break
+    except ExecutionTimeout:
+        # the time limit also applies to fetching next batches
+        pass
+    finally:
+        cursor.close()
+    return documents
+
+
+def flatten_document(document: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """
+    Flatten nested documents into dotted fields
+    """
+    fields = {}
+    for key, value in document.items():
+        if isinstance(value, dict):
+            fields.update(flatten_document(value, f"{prefix}{key}."))
+        else:
+            fields[f"{prefix}{key}"] = value
+    return fields
+
+
+def infer_mongodb_type(values: pd.Series) -> str:
+    """
+    Merge types of field values into a single column type
+    """
+    # missing values are skipped, so they don't turn integers into floats
+    values = values.astype(object).dropna()
+    inferred = infer_dtype(values, skipna=True)
+    mapping = {
+        # sampled values are 64-bit integers
+        "integer": "bigint",
+        "floating": "float",
+        "mixed-integer-float": "float",
+        "decimal": "float",
+        "boolean": "bool",
+        "datetime": "datetime",
+        "datetime64": "datetime",
+    }
+    if inferred in mapping:
+        return mapping[inferred]
+    if inferred == "mixed":
+        if values.map(lambda v: isinstance(v, Decimal128)).all():
+            return "float"
+    return "str"
+
+
+def get_mongodb_tables_info(url: str, colls: List[str]) -> List[TableInfo]:
     table_info = []
     # establish connection
-    client, db_name = create_mongodb_connection(url)
+    client, db_name = get_mongodb_connection(url)
     db = client[db_name]
     for collection_name in colls:
-        collection = db[collection_name]
-        columns = collection.find_one()
-        # parse results
-        column_info = []
-        for key, value in columns.items():  # type: ignore
-            if key == "_id":
-                continue
-            column_info.append({"name": key, "type": type(value).__name__})
+        documents = sample_mongodb_documents(db[collection_name])
+        # values are kept as objects, pd.json_normalize() would cast
+        # integer columns with missing values to floats
+        frame = pd.DataFrame(map(flatten_document, documents), dtype=object)
+        column_info: List[ColumnInfo] = [
+            {"name": str(name), "type": infer_mongodb_type(frame[name])}
+            for name in frame.columns
+        ]
         table_info.append({"table_name": collection_name, "columns": column_info})
-    # close connection
-    client.close()
     return table_info
 
 
-def get_tables(database_url: str, tables: List[str]) -> List[TableInfo]:
+def request_tables(database_url: str, tables: List[str]) -> List[TableInfo]:
     database_functions = {
         "postgres://": (get_postgres_tables, get_postgres_tables_info),
         "postgresql://": (get_postgres_tables, get_postgres_tables_info),
@@ -230,90 +379,578 @@ def get_tables(database_url: str, tables: List[str]) -> List[TableInfo]:
     raise ValueError("Unsupported database URL")
 
 
-def read_from_postgres(url: str, columns: List[str], table_name: str):
-    conn = create_postgres_connection(url)
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT {','.join(columns)} FROM {table_name}")
-    data = cursor.fetchall()
-    # Write data to a file
-    cwd = os.getcwd()
-    filepath = os.path.join(cwd, "utils", "tmp", f"{uuid.uuid4().hex}.csv")
-    with open(filepath, "w") as file:
-        for row in data:
-            file.write(",".join(map(str, row)) + "\n")
-    # close connection
-    cursor.close()
-    conn.close()
-    return filepath
+# introspection results by (database url, table name)
+tables_cache: TTLCache = TTLCache(
+    maxsize=settings.SCHEMA_CACHE_SIZE, ttl=settings.SCHEMA_CACHE_TTL
+)
+tables_cache_lock = Lock()
+
+
+def get_tables(
+    database_url: str, tables: List[str], refresh: bool = False
+) -> List[TableInfo]:
+    """
+    Get tables info, only tables missing from the cache are requested
+    from the database unless `refresh` is set
+    """
+    with tables_cache_lock:
+        cached = {
+            table: tables_cache.get((database_url, table))
+            for table in tables
+            if not refresh
+        }
+    missing = [table for table in tables if cached.get(table) is None]
+    if missing:
+        for table_info in request_tables(database_url, missing):
+            table_name = table_info["table_name"]
+            cached[table_name] = table_info
+            with tables_cache_lock:
+                tables_cache[(database_url, table_name)] = table_info
+    return [cached[table] for table in tables if table in cached]
+
+
+def create_arrow_schema(columns: List[ColumnInfo]) -> pa.Schema:
+    """
+    Map table columns to the Arrow types matching their Spark types
+    """
+    mapping = {
+        "int": pa.int32(),
+        "bigint": pa.int64(),
+        "float": pa.float32(),
+        "bool": pa.bool_(),
+        "str": pa.string(),
+    }
+    fields = [
+        (column["name"], mapping.get(column["type"], pa.string())) for column in columns
+    ]
+    return pa.schema(fields)
+
+
+def create_staging_schema(table: DataTableModel) -> pa.Schema:
+    """
+    Map table columns to staged Arrow types. The watermark column is kept
+    in a 64-bit type, so the high-water mark is read without loss
+    """
+    schema = create_arrow_schema(table.columns)  # type: ignore
+    if table.watermark_column not in schema.names:
+        return schema
+    index = schema.get_field_index(table.watermark_column)
+    field = schema.field(index)
+    if pa.types.is_integer(field.type):
+        return schema.set(index, field.with_type(pa.int64()))
+    if pa.types.is_floating(field.type):
+        return schema.set(index, field.with_type(pa.float64()))
+    return schema
+
+
+def to_arrow_array(values: List[Any], data_type: pa.DataType) -> pa.Array:
+    """
+    Convert column values with a safe cast, so overflowing or fractional
+    values raise instead of being wrapped or truncated
+    """
+    if pa.types.is_string(data_type):
+        values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+        return pa.array(values, type=data_type)
+    if pa.types.is_floating(data_type):
+        # e.g. decimals, float columns keep only float precision
+        values = [float(v) if isinstance(v, (Decimal, int)) else v for v in values]
+        return pa.array(values, type=pa.float64()).cast(data_type)
+    # e.g. tinyint to bool, typed pa.array() would truncate floats silently
+    return pa.array(values).cast(data_type)
+
+
+def cast_to_schema(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Cast table columns to schema types. Overflowing or fractional values
+    raise, numbers cast to float columns keep only float precision
+    """
+    columns = []
+    for field in schema:
+        column = table[field.name]
+        # a safe cast rejects integers a float can't represent exactly
+        to_float = pa.types.is_floating(field.type) and (
+            pa.types.is_integer(column.type) or pa.types.is_decimal(column.type)
+        )
+        columns.append(column.cast(field.type, safe=not to_float))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def to_record_batch(rows: List[Sequence[Any]], schema: pa.Schema) -> pa.RecordBatch:
+    columns = list(zip(*rows))
+    arrays = [to_arrow_array(list(col), f.type) for col, f in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def is_arrow_type_compatible(actual: pa.DataType, expected: pa.DataType) -> bool:
+    if pa.types.is_integer(expected):
+        return pa.types.is_integer(actual)
+    if pa.types.is_floating(expected):
+        return (
+            pa.types.is_floating(actual)
+            or pa.types.is_integer(actual)
+            or pa.types.is_decimal(actual)
+        )
+    if pa.types.is_boolean(expected):
+        return pa.types.is_boolean(actual)
+    # dates and times are stored as strings
+    return (
+        pa.types.is_string(actual)
+        or pa.types.is_large_string(actual)
+        or pa.types.is_temporal(actual)
+    )
 
 
-def read_from_mysql(url: str, columns: List[str], table_name: str):
-    conn = create_mysql_connection(url)
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT {','.join(columns)} FROM {table_name}")
-    data = cursor.fetchall()
-    # Write data to a file
-    cwd = os.getcwd()
-    filepath = os.path.join(cwd, "utils", "tmp", f"{uuid.uuid4().hex}.csv")
-    with open(filepath, "w") as file:
-        for row in data:
-            file.write(",".join(map(str, row)) + "\n")
-    # close connection
-    cursor.close()
-    conn.close()
+def validate_arrow_schema(schema: pa.Schema, columns: List[ColumnInfo]) -> str | None:
+    """
+    Check that file schema provides table columns with compatible types,
+    return error message otherwise
+    """
+    expected = create_arrow_schema(columns)
+    missing = [field.name for field in expected if field.name not in schema.names]
+    if missing:
+        return f"Missing columns: {', '.join(missing)}"
+    for field in expected:
+        actual = schema.field(field.name).type
+        if not is_arrow_type_compatible(actual, field.type):
+            return f"Column {field.name} has type {actual}, expected {field.type}"
+    return None
+
+
+def arrow_batches_to_frames(
+    batches: Iterable[pa.RecordBatch], columns: List[ColumnInfo]
+) -> Iterator[pd.DataFrame]:
+    """
+    Convert record batches to table columns and types without parsing
+    """
+    schema = create_arrow_schema(columns)
+    for batch in batches:
+        yield cast_to_schema(pa.Table.from_batches([batch]), schema).to_pandas()
+
+
+def get_tmp_filepath(file_format: str) -> str:
+    tmp_dir = os.path.join(os.getcwd(), "utils", "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, f"{uuid.uuid4().hex}.{file_format}")
+
+
+def write_to_parquet(batches: Iterable[pa.RecordBatch], schema: pa.Schema) -> str:
+    """
+    Write record batches into a Parquet staging file one at a time
+    """
+    filepath = get_tmp_filepath("parquet")
+    with pq.ParquetWriter(filepath, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
     return filepath
 
 
-def parse_mongodb_data(data):
-    res = []
-    for document in data:
-        line: Dict = json.loads(json.dumps(document, default=str))
-        line.pop("_id", None)
-        res.append(line)
-    return res
+def build_select_query(
+    columns: List[str], table_name: str, where: str | None = None
+) -> str:
+    query = f"SELECT {','.join(columns)} FROM {table_name}"
+    if where is not None:
+        query += f" WHERE {where}"
+    return query
+
+
+def read_from_postgres(
+    url: str,
+    schema: pa.Schema,
+    table_name: str,
+    itersize: int = settings.INGEST_BATCH_SIZE,
+    where: str | None = None,
+    use_copy: bool = True,
+) -> str:
+    """
+    Export table rows into a Parquet file. By default the server serializes
+    rows itself through `COPY ... TO STDOUT` and the CSV is parsed by Arrow;
+    otherwise rows are streamed through a server-side cursor,
+    `itersize` rows at a time
+    """
+    query = build_select_query(schema.names, table_name, where)
+    if not use_copy:
+        with postgres_connection(url) as conn:
+            # named cursor keeps the result set on the server
+            cursor = conn.cursor(name=f"ingest_{uuid.uuid4().hex}")
+            cursor.itersize = itersize
+            cursor.execute(query)
+            batches = iter(lambda: cursor.fetchmany(itersize), [])
+            filepath = write_to_parquet(
+                (to_record_batch(rows, schema) for rows in batches), schema
+            )
+            cursor.close()
+        return filepath
+
+    csv_path = get_tmp_filepath("csv")
+    with postgres_connection(url) as conn, open(csv_path, "w", newline="") as file:
+        cursor = conn.cursor()
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV", file)
+        cursor.close()
+    try:
+        return copy_csv_to_parquet(csv_path, schema)
+    finally:
+        os.unlink(csv_path)
+
+
+def copy_csv_to_parquet(csv_path: str, schema: pa.Schema) -> str:
+    """
+    Convert CSV written by Postgres COPY into a Parquet staging file
+    """
+    # only unquoted empty values are NULLs, e.g. NA is kept as text.
+    # Booleans are written as t/f
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(column_names=schema.names),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=schema,
+            null_values=[""],
+            true_values=["t"],
+            false_values=["f"],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+    return write_to_parquet(reader, schema)
+
+
+def read_from_mysql(
+    url: str,
+    schema: pa.Schema,
+    table_name: str,
+    batch_size: int = settings.INGEST_BATCH_SIZE,
+    where: str | None = None,
+) -> str:
+    """
+    Stream table rows into a Parquet file through an unbuffered cursor,
+    so only `batch_size` rows are held in memory at a time
+    """
+    with mysql_connection(url) as conn:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(build_select_query(schema.names, table_name, where))
+        # Write data to a file batch by batch
+        batches = iter(lambda: cursor.fetchmany(batch_size), [])
+        filepath = write_to_parquet(
+            (to_record_batch(rows, schema) for rows in batches), schema
+        )
+        cursor.close()
+    return filepath
 
 
-def read_from_mongodb(url: str, columns: List[str], table_name: str) -> str:
-    client, db_name = create_mongodb_connection(url)
+def serialize_bson(value):
+    """
+    Convert BSON values that are not JSON serializable
+    """
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # ObjectId and the rest of BSON types
+    return str(value)
+
+
+def parse_bson_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=serialize_bson)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    return value
+
+
+def get_field(document: Dict[str, Any], path: str) -> Any:
+    """
+    Get value of a field by its dotted path
+    """
+    value: Any = document
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def read_from_mongodb(
+    url: str,
+    schema: pa.Schema,
+    table_name: str,
+    batch_size: int = settings.INGEST_BATCH_SIZE,
+    where: Dict[str, Any] | None = None,
+) -> str:
+    """
+    Stream collection documents into a Parquet file,
+    fetching `batch_size` documents per round trip
+    """
+    client, db_name = get_mongodb_connection(url)
     db = client[db_name]
     collection = db[table_name]
-    data = collection.find({}, {column: 1 for column in columns})
-    json_data = parse_mongodb_data(data)
-    # Write data to a file
-    cwd = os.getcwd()
-    filepath = os.path.join(cwd, "utils", "tmp", f"{uuid.uuid4().hex}.json")
-    with open(filepath, "w") as file:
-        json.dump(json_data, file)
-        # for document in data:
-        #     file.write(str(document) + "\n")
-    # close connection
-    client.close()
+    projection = {column: 1 for column in schema.names}
+    projection["_id"] = 0
+    data = collection.find(where or {}, projection, batch_size=batch_size)
+    # documents may miss some fields
+    rows = (
+        [parse_bson_value(get_field(document, column)) for column in schema.names]
+        for document in data
+    )
+    # Write data to a file batch by batch
+    batches = iter(lambda: list(islice(rows, batch_size)), [])
+    filepath = write_to_parquet(
+        (to_record_batch(rows, schema) for rows in batches), schema
+    )
     return filepath
 
 
-def read_from_db(url: str, columns: List[str], table_name: str) -> str:
+def read_from_db(
+    url: str,
+    schema: pa.Schema,
+    table_name: str,
+    batch_size: int = settings.INGEST_BATCH_SIZE,
+    where: str | Dict[str, Any] | None = None,
+    use_copy: bool = True,
+) -> str:
+    """
+    Read table rows into a staging file. `where` is an SQL condition
+    for relational sources and a filter document for MongoDB. Postgres
+    tables are exported with COPY unless `use_copy` is unset
+    """
+    if url.startswith(("postgres://", "postgresql://")):
+        return read_from_postgres(
+            url, schema, table_name, batch_size, where, use_copy  # type: ignore
+        )
     database_functions = {
-        "postgres://": read_from_postgres,
-        "postgresql://": read_from_postgres,
         "mysql://": read_from_mysql,
         "mongodb://": read_from_mongodb,
     }
     for prefix, read_from in database_functions.items():
         if url.startswith(prefix):
-            file_path = read_from(url, columns, table_name)
+            file_path = read_from(url, schema, table_name, batch_size, where)
             return file_path
 
     raise ValueError("Unsupported database URL")
 
 
-def from_table_to_file(ds_url: str, table: DataTableModel) -> Tuple[str, pd.DataFrame]:
-    # get data into file
-    columns = [item["name"] for item in table.columns]
-    filepath = read_from_db(ds_url, columns, table.name)
-    # ingest data
-    file_format = filepath.split(".")[-1]
-    if file_format.lower() == "json":
-        df = pd.read_json(filepath)
+def get_postgres_primary_keys(url: str, table_name: str) -> List[str]:
+    with postgres_connection(url) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT a.attname FROM pg_index i
+            JOIN pg_attribute a
+            ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass AND i.indisprimary;
+            """,
+            (table_name,),
+        )
+        primary_keys = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    return primary_keys
+
+
+def get_mysql_primary_keys(url: str, table_name: str) -> List[str]:
+    with mysql_connection(url) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT column_name FROM information_schema.key_column_usage
+            WHERE table_schema = DATABASE() AND table_name = %s
+            AND constraint_name = 'PRIMARY';
+            """,
+            (table_name,),
+        )
+        primary_keys = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    return primary_keys
+
+
+def get_split_column(
+    url: str, table_name: str, columns: List[ColumnInfo]
+) -> str | None:
+    """
+    Pick an integer column to split the table on, preferring the primary key
+    """
+    database_functions = {
+        "postgres://": get_postgres_primary_keys,
+        "postgresql://": get_postgres_primary_keys,
+        "mysql://": get_mysql_primary_keys,
+    }
+    int_columns = [
+        column["name"] for column in columns if column["type"] in ("int", "bigint")
+    ]
+    for prefix, get_primary_keys in database_functions.items():
+        if url.startswith(prefix):
+            primary_keys = get_primary_keys(url, table_name)
+            candidates = [key for key in primary_keys if key in int_columns]
+            candidates += int_columns
+            return candidates[0] if candidates else None
+    # collections are not split
+    return None
+
+
+def get_column_bounds(url: str, table_name: str, column: str) -> Tuple[Any, Any]:
+    if url.startswith(("postgres://", "postgresql://")):
+        connection = postgres_connection(url)
     else:
-        df = pd.read_csv(filepath)
-    return filepath, df
+        connection = mysql_connection(url)
+    with connection as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT MIN({column}), MAX({column}) FROM {table_name}")
+        lower, upper = cursor.fetchone()  # type: ignore
+        cursor.close()
+    return lower, upper
+
+
+def get_split_predicates(
+    column: str, lower: int, upper: int, partitions: int
+) -> List[str]:
+    """
+    Split [lower, upper] into at most `partitions` non-overlapping ranges
+    """
+    bounds = sorted(
+        {lower + (upper - lower + 1) * i // partitions for i in range(partitions + 1)}
+    )
+    predicates = [
+        f"{column} >= {start} AND {column} < {end}"
+        for start, end in zip(bounds, bounds[1:])
+    ]
+    # rows without split value go to the first range
+    predicates[0] = f"({predicates[0]}) OR {column} IS NULL"
+    return predicates
+
+
+def read_with_limit(
+    limit: ContextManager,
+    url: str,
+    schema: pa.Schema,
+    table_name: str,
+    batch_size: int,
+    where: str | Dict[str, Any] | None,
+    use_copy: bool = True,
+) -> str:
+    with limit:
+        return read_from_db(url, schema, table_name, batch_size, where, use_copy)
+
+
+def read_table_to_files(
+    ds_url: str,
+    table: DataTableModel,
+    batch_size: int = settings.INGEST_BATCH_SIZE,
+    partitions: int = 1,
+    where: str | Dict[str, Any] | None = None,
+    limit: ContextManager | None = None,
+    use_copy: bool = True,
+) -> List[str]:
+    """
+    Read a table into staging files. With several partitions the table is
+    split into ranges of an integer column, read over separate connections.
+    Every connection holds `limit` while it is open
+    """
+    limit = limit or nullcontext()
+    # ranges can't be read over more connections than the pool holds
+    partitions = min(partitions, settings.SOURCE_POOL_MAX_SIZE)
+    schema = create_staging_schema(table)
+    predicates: List[Any] = [None]
+    if partitions > 1:
+        with limit:
+            column = get_split_column(ds_url, table.name, table.columns)  # type: ignore
+            if column is not None:
+                lower, upper = get_column_bounds(ds_url, table.name, column)
+        if column is not None and lower is not None:
+            predicates = get_split_predicates(column, lower, upper, partitions)
+    if where is not None:
+        predicates = [
+            where if predicate is None else f"({predicate}) AND ({where})"
+            for predicate in predicates
+        ]
+    if len(predicates) == 1:
+        return [
+            read_with_limit(
+                limit, ds_url, schema, table.name, batch_size, predicates[0], use_copy
+            )
+        ]
+    # read ranges in parallel
+    with ThreadPoolExecutor(max_workers=len(predicates)) as executor:
+        futures = [
+            executor.submit(
+                read_with_limit,
+                limit,
+                ds_url,
+                schema,
+                table.name,
+                batch_size,
+                where,
+                use_copy,
+            )
+            for where in predicates
+        ]
+    filepaths, errors = [], []
+    for future in futures:
+        try:
+            filepaths.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        for filepath in filepaths:
+            os.unlink(filepath)
+        raise errors[0]
+    return filepaths
+
+
+def get_watermark_filter(
+    url: str, table: DataTableModel
+) -> str | Dict[str, Any] | None:
+    """
+    Build a condition selecting rows above the table high-water mark
+    """
+    if table.watermark_column is None or table.watermark is None:
+        return None
+    column = table.watermark_column
+    column_type = next(c["type"] for c in table.columns if c["name"] == column)
+    mark: Any = table.watermark
+    if column_type in ("int", "bigint"):
+        mark = int(mark)
+    elif column_type == "float":
+        mark = float(mark)
+    if url.startswith("mongodb://"):
+        if column_type == "datetime":
+            mark = datetime.fromisoformat(mark)
+        return {column: {"$gt": mark}}
+    if isinstance(mark, str):
+        mark = "'" + mark.replace("'", "''") + "'"
+    return f"{column} > {mark}"
+
+
+def get_max_value(filepaths: List[str], column: str) -> str | None:
+    """
+    Find the new high-water mark in staged files
+    """
+    values = [
+        pc.max(pq.read_table(filepath, columns=[column])[column]).as_py()
+        for filepath in filepaths
+    ]
+    values = [value for value in values if value is not None]
+    return str(max(values)) if values else None
+
+
+def read_staged_file(filepath: str) -> pd.DataFrame:
+    # staged columns are already typed, no parsing needed
+    return pq.read_table(filepath).to_pandas()
+
+
+def read_staged_batches(
+    filepath: str, batch_size: int = settings.SPARK_ARROW_BATCH_SIZE
+) -> Iterator[pa.RecordBatch]:
+    """
+    Read a staged file `batch_size` rows at a time
+    """
+    with pq.ParquetFile(filepath) as parquet_file:
+        yield from parquet_file.iter_batches(batch_size=batch_size)
+
+
+def from_table_to_file(
+    ds_url: str,
+    table: DataTableModel,
+    batch_size: int = settings.INGEST_BATCH_SIZE,
+    use_copy: bool = True,
+) -> Tuple[str, pd.DataFrame]:
+    # get data into file
+    schema = create_arrow_schema(table.columns)  # type: ignore
+    filepath = read_from_db(ds_url, schema, table.name, batch_size, None, use_copy)
+    return filepath, read_staged_file(filepath)
@@ -0,0 +1,86 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from threading import BoundedSemaphore, Lock
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import urlparse
+
+from .databases import TableInfo, get_tables
+from .settings import settings
+
+# drivers are synchronous, so requests run in a dedicated thread pool
+executor = ThreadPoolExecutor(
+    max_workers=settings.INTROSPECTION_WORKERS, thread_name_prefix="introspection"
+)
+# concurrent requests by database host
+host_limits: Dict[str, BoundedSemaphore] = {}
+host_limits_lock = Lock()
+
+
+def get_host_limit(url: str) -> BoundedSemaphore:
+    host = urlparse(url).netloc.rpartition("@")[2]
+    with host_limits_lock:
+        limit = host_limits.get(host)
+        if limit is None:
+            limit = BoundedSemaphore(settings.INTROSPECTION_HOST_LIMIT)
+            host_limits[host] = limit
+    return limit
+
+
+def run_limited(url: str, func: Callable[..., Any], *args) -> Any:
+    with get_host_limit(url):
+        return func(*args)
+
+
+def split_requests(url: str, tables: List[str]) -> List[List[str]]:
+    """
+    Group tables into independent requests: MongoDB collections are sampled
+    one by one, SQL tables are described by a single query
+    """
+    if url.startswith("mongodb://"):
+        return [[table] for table in tables]
+    return [tables] if tables else []
+
+
+async def introspect(
+    url: str, tables: List[str], refresh: bool = False
+) -> List[TableInfo]:
+    """
+    Get tables info of a database, independent requests run concurrently
+    """
+    loop = asyncio.get_running_loop()
+    requests = [
+        asyncio.wait_for(
+            loop.run_in_executor(
+                executor, run_limited, url, get_tables, url, group, refresh
+            ),
+            timeout=settings.INTROSPECTION_TIMEOUT,
+        )
+        for group in split_requests(url, tables)
+    ]
+    try:
+        results = await asyncio.gather(*requests)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Tables request to {urlparse(url).hostname} timed out")
+    return list(chain.from_iterable(results))
+
+
+async def introspect_all(
+    sources: List[Tuple[str, List[str]]], refresh: bool = False
+) -> List[List[TableInfo]]:
+    requests = [introspect(url, tables, refresh) for url, tables in sources]
+    return await asyncio.gather(*requests)
+
+
+def get_tables_concurrently(
+    sources: List[Tuple[str, List[str]]], refresh: bool = False
+) -> List[List[TableInfo]]:
+    """
+    Get tables info of several databases at once, results follow
+    the order of `sources`
+    """
+    return asyncio.run(introspect_all(sources, refresh))
+
+
+def shutdown():
+    executor.shutdown(wait=False, cancel_futures=True)
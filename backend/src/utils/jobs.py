@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Callable, Dict
+from uuid import UUID
+
+import structlog
+
+from .settings import settings
+
+log = structlog.get_logger(module=__name__)
+
+# long-running jobs run outside of request threads
+executor = ThreadPoolExecutor(
+    max_workers=settings.JOB_WORKERS, thread_name_prefix="jobs"
+)
+# cancellation flags of submitted jobs
+cancel_events: Dict[UUID, Event] = {}
+cancel_events_lock = Lock()
+
+
+def submit(job_id: UUID, func: Callable[[Event], None]):
+    """
+    Run job in background, `func` receives the event set on cancellation
+    """
+    cancelled = Event()
+    with cancel_events_lock:
+        cancel_events[job_id] = cancelled
+
+    def run():
+        try:
+            func(cancelled)
+        except Exception as e:
+            log.error(f"[JOB] {job_id} {e}")
+        finally:
+            with cancel_events_lock:
+                cancel_events.pop(job_id, None)
+
+    executor.submit(run)
+
+
+def cancel(job_id: UUID) -> bool:
+    with cancel_events_lock:
+        cancelled = cancel_events.get(job_id)
+    if cancelled is None:
+        return False
+    cancelled.set()
+    return True
+
+
+def shutdown():
+    with cancel_events_lock:
+        for cancelled in cancel_events.values():
+            cancelled.set()
+    executor.shutdown(wait=False, cancel_futures=True)
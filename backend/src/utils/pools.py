@@ -0,0 +1,158 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock
+from typing import Any, Callable, Deque, Dict, Iterator, Tuple
+
+from .settings import settings
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of connections to one database
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        is_alive: Callable[[Any], bool],
+        reset: Callable[[Any], None],
+        max_size: int = settings.SOURCE_POOL_MAX_SIZE,
+        idle_timeout: int = settings.SOURCE_POOL_IDLE_TIMEOUT,
+        check_interval: int = settings.SOURCE_POOL_CHECK_INTERVAL,
+        close: Callable[[Any], None] = lambda conn: conn.close(),
+    ) -> None:
+        self.connect = connect
+        self.is_alive = is_alive
+        self.reset = reset
+        self.close_connection = close
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._slots = BoundedSemaphore(max_size)
+        self._lock = Lock()
+
+    def __discard(self, conn: Any):
+        try:
+            self.close_connection(conn)
+        except Exception:
+            pass
+
+    def __take_idle(self) -> Any | None:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                # the most recently used connection is the most likely alive
+                conn, released_at = self._idle.pop()
+            idle_time = time.monotonic() - released_at
+            if idle_time > self.idle_timeout:
+                self.__discard(conn)
+                continue
+            # connections unused for a while are checked before reuse
+            if idle_time > self.check_interval and not self.is_alive(conn):
+                self.__discard(conn)
+                continue
+            return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        if not self._slots.acquire(timeout=settings.SOURCE_POOL_TIMEOUT):
+            raise TimeoutError("No free connection in the pool")
+        try:
+            conn = self.__take_idle()
+            if conn is None:
+                conn = self.connect()
+            try:
+                yield conn
+            except BaseException:
+                # connection state is unknown after a failure or an abandoned
+                # lease, e.g. a closed streaming response
+                self.__discard(conn)
+                raise
+            try:
+                self.reset(conn)
+            except Exception:
+                self.__discard(conn)
+                return
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [c for c, t in self._idle if now - t > self.idle_timeout]
+            self._idle = deque(
+                (c, t) for c, t in self._idle if now - t <= self.idle_timeout
+            )
+        for conn in expired:
+            self.__discard(conn)
+
+    def close(self):
+        with self._lock:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self.__discard(conn)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_clients: Dict[str, Any] = {}
+_registry_lock = Lock()
+_last_eviction = time.monotonic()
+
+
+def _evict_idle():
+    global _last_eviction
+    now = time.monotonic()
+    if now - _last_eviction < settings.SOURCE_POOL_CHECK_INTERVAL:
+        return
+    _last_eviction = now
+    for pool in list(_pools.values()):
+        pool.evict_idle()
+
+
+def get_pool(
+    url: str,
+    connect: Callable[[str], Any],
+    is_alive: Callable[[Any], bool],
+    reset: Callable[[Any], None],
+    **options: Any,
+) -> ConnectionPool:
+    """
+    Get connection pool of a database, one pool per URL. `options` override
+    pool limits and the way connections are closed
+    """
+    with _registry_lock:
+        pool = _pools.get(url)
+        if pool is None:
+            pool = ConnectionPool(lambda: connect(url), is_alive, reset, **options)
+            _pools[url] = pool
+    _evict_idle()
+    return pool
+
+
+def get_client(url: str, connect: Callable[[str], Any]) -> Any:
+    """
+    Get client that pools connections itself, one client per URL
+    """
+    with _registry_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = connect(url)
+            _clients[url] = client
+    return client
+
+
+def close_all():
+    with _registry_lock:
+        pools = list(_pools.values())
+        clients = list(_clients.values())
+        _pools.clear()
+        _clients.clear()
+    for pool in pools:
+        pool.close()
+    for client in clients:
+        client.close()
@@ -0,0 +1,147 @@
+import json
+import re
+from threading import Lock
+from typing import Any, Callable, Dict, List, Tuple
+
+from cachetools import LRUCache
+
+from .settings import settings
+
+
+def get_entry_size(entry: Tuple[Dict[str, int], List[Any]]) -> int:
+    """
+    Size of a cached result encoded as JSON
+    """
+    return len(json.dumps(entry[1], default=str).encode())
+
+
+# (table versions, rows) of read queries by (node url, query), bounded by
+# the total size of results in bytes
+results: LRUCache = LRUCache(
+    maxsize=settings.QUERY_CACHE_MAX_BYTES, getsizeof=get_entry_size
+)
+stats = {"hits": 0, "misses": 0}
+cache_lock = Lock()
+
+QUOTED = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+# functions returning a different result on every call
+NON_DETERMINISTIC = re.compile(
+    r"\b(?:current_date|current_timestamp|current_timezone|current_user|now"
+    + r"|localtimestamp|unix_timestamp|rand|randn|random|uuid|shuffle"
+    + r"|monotonically_increasing_id|spark_partition_id|input_file_name"
+    + r"|tablesample)\b"
+)
+# words that can follow a source instead of its alias
+CLAUSES = (
+    r"(?:join|on|using|where|group|having|order|sort|cluster|distribute|limit"
+    + r"|window|union|except|intersect|minus|left|right|full|inner|outer|cross"
+    + r"|natural|semi|anti|lateral|pivot|unpivot)\b"
+)
+SOURCE = rf"[\w.]+(?:\s+(?:as\s+)?(?!{CLAUSES})\w+)?"
+# comma separated sources of FROM and JOIN clauses
+SOURCES = re.compile(rf"\b(?:from|join)\s+({SOURCE}(?:\s*,\s*{SOURCE})*)")
+# tables are created in the default database
+DEFAULT_DATABASE = ["spark_catalog.default.", "default."]
+
+
+def normalize_query(query: str) -> str:
+    """
+    Make equivalent queries share a key: whitespace and case are
+    normalised outside of quoted literals and identifiers
+    """
+    parts = QUOTED.split(query.strip().rstrip(";").strip())
+    # odd parts are quoted
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part).lower()
+        for i, part in enumerate(parts)
+    )
+
+
+def strip_literals(query: str) -> str:
+    """
+    Drop string literals and unquote identifiers of the normalised query
+    """
+    parts = QUOTED.split(query)
+    return "".join(
+        (part[1:-1].lower() if part.startswith("`") else "''") if i % 2 else part
+        for i, part in enumerate(parts)
+    )
+
+
+def find_tables(query: str, table_names: List[str]) -> List[str] | None:
+    """
+    Get known tables the normalised query reads. None when its result
+    can't be cached: the statement isn't a query, e.g. INSERT ... SELECT
+    or CREATE TABLE ... AS SELECT, the query is non-deterministic, reads
+    no table, or reads anything but known tables, e.g. views, tables
+    of other databases, subqueries or table functions
+    """
+    code = strip_literals(query)
+    if not re.match(r"(?:select|with)\b", code):
+        return None
+    if NON_DETERMINISTIC.search(code) or re.search(r"\b(?:from|join)\s*\(", code):
+        return None
+    known = {name.lower(): name for name in table_names}
+    tables = set()
+    for sources in SOURCES.findall(code):
+        for source in sources.split(","):
+            name = source.split()[0]
+            for prefix in DEFAULT_DATABASE:
+                name = name.removeprefix(prefix)
+            if name not in known:
+                return None
+            tables.add(known[name])
+    return sorted(tables) if tables else None
+
+
+def get(
+    node_url: str,
+    query: str,
+    get_versions: Callable[[List[str]], Dict[str, int] | None],
+) -> List[Any] | None:
+    """
+    Get result read before, if its tables are still at the versions
+    it was read at. Current versions are only looked up for cached
+    queries, outside of the lock
+    """
+    with cache_lock:
+        entry = results.get((node_url, query))
+    result = None
+    if entry is not None and get_versions(sorted(entry[0])) == entry[0]:
+        result = entry[1]
+    with cache_lock:
+        stats["hits" if result is not None else "misses"] += 1
+    return result
+
+
+def put(node_url: str, query: str, versions: Dict[str, int], result: List[Any]):
+    """
+    Cache result read at given table versions. Versions are taken before
+    the query runs, so a write committed meanwhile makes the entry stale
+    on the next version check
+    """
+    with cache_lock:
+        try:
+            results[(node_url, query)] = (versions, result)
+        except ValueError:
+            # result is larger than the whole cache
+            pass
+
+
+def invalidate_table(table_name: str):
+    """
+    Forget cached results of a table after a new version is committed
+    """
+    with cache_lock:
+        for key in [key for key, entry in results.items() if table_name in entry[0]]:
+            del results[key]
+
+
+def get_stats() -> Dict[str, int]:
+    with cache_lock:
+        return {
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "entries": len(results),
+            "bytes": int(results.currsize),
+        }
@@ -1,6 +1,6 @@
 from typing import List
 
-from pydantic import BaseSettings, Field, NonNegativeInt
+from pydantic import BaseSettings, Field, NonNegativeInt, PositiveInt
 
 
 class Settings(BaseSettings):
@@ -16,6 +16,48 @@ class Settings(BaseSettings):
         env="ACCESS_TOKEN_EXPIRE", default=90
     )
     JWT_SECRET_KEY: str = Field(env="JWT_SECRET_KEY", default="", repr=False)
+    INGEST_BATCH_SIZE: PositiveInt = Field(env="INGEST_BATCH_SIZE", default=10000)
+    INGEST_WORKERS: PositiveInt = Field(env="INGEST_WORKERS", default=4)
+    INGEST_WRITE_WORKERS: PositiveInt = Field(env="INGEST_WRITE_WORKERS", default=2)
+    INGEST_DS_CONNECTIONS: PositiveInt = Field(env="INGEST_DS_CONNECTIONS", default=2)
+    INGEST_PARTITIONS: PositiveInt = Field(env="INGEST_PARTITIONS", default=1)
+    SOURCE_POOL_MAX_SIZE: PositiveInt = Field(env="SOURCE_POOL_MAX_SIZE", default=5)
+    SOURCE_POOL_IDLE_TIMEOUT: PositiveInt = Field(
+        env="SOURCE_POOL_IDLE_TIMEOUT", default=300
+    )
+    SOURCE_POOL_CHECK_INTERVAL: PositiveInt = Field(
+        env="SOURCE_POOL_CHECK_INTERVAL", default=30
+    )
+    SOURCE_POOL_TIMEOUT: PositiveInt = Field(env="SOURCE_POOL_TIMEOUT", default=30)
+    SCHEMA_CACHE_TTL: PositiveInt = Field(env="SCHEMA_CACHE_TTL", default=600)
+    SCHEMA_CACHE_SIZE: PositiveInt = Field(env="SCHEMA_CACHE_SIZE", default=1024)
+    MONGODB_SAMPLE_SIZE: PositiveInt = Field(env="MONGODB_SAMPLE_SIZE", default=1000)
+    MONGODB_SAMPLE_TIME_MS: PositiveInt = Field(
+        env="MONGODB_SAMPLE_TIME_MS", default=2000
+    )
+
+    INTROSPECTION_WORKERS: PositiveInt = Field(env="INTROSPECTION_WORKERS", default=8)
+    INTROSPECTION_HOST_LIMIT: PositiveInt = Field(
+        env="INTROSPECTION_HOST_LIMIT", default=2
+    )
+    INTROSPECTION_TIMEOUT: PositiveInt = Field(env="INTROSPECTION_TIMEOUT", default=30)
+    JOB_WORKERS: PositiveInt = Field(env="JOB_WORKERS", default=2)
+    UPLOAD_CHUNK_SIZE: PositiveInt = Field(env="UPLOAD_CHUNK_SIZE", default=100000)
+    SPARK_POOL_MAX_SIZE: PositiveInt = Field(env="SPARK_POOL_MAX_SIZE", default=4)
+    SPARK_POOL_IDLE_TIMEOUT: PositiveInt = Field(
+        env="SPARK_POOL_IDLE_TIMEOUT", default=600
+    )
+    SPARK_POOL_CHECK_INTERVAL: PositiveInt = Field(
+        env="SPARK_POOL_CHECK_INTERVAL", default=30
+    )
+    QUERY_BATCH_SIZE: PositiveInt = Field(env="QUERY_BATCH_SIZE", default=10000)
+    CURSOR_TTL: PositiveInt = Field(env="CURSOR_TTL", default=600)
+    QUERY_CACHE_MAX_BYTES: PositiveInt = Field(
+        env="QUERY_CACHE_MAX_BYTES", default=256 * 1024 * 1024
+    )
+    SPARK_ARROW_BATCH_SIZE: PositiveInt = Field(
+        env="SPARK_ARROW_BATCH_SIZE", default=100000
+    )
 
 
 settings = Settings()
@@ -1,22 +1,54 @@
+import base64
+import io
+import json
+import math
 import os
-from typing import Dict, List
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain, islice
+from threading import BoundedSemaphore, Event
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    TypedDict,
+)
+from uuid import UUID
 
 import pandas as pd
+import pyarrow as pa
 from delta.pip_utils import configure_spark_with_delta_pip
-from pyspark.sql import SparkSession
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.connect.session import SparkSession as RemoteSparkSession
+from pyspark.sql.pandas.types import to_arrow_schema
 from pyspark.sql.types import (
     BooleanType,
     DataType,
     FloatType,
     IntegerType,
+    LongType,
     StringType,
     StructField,
     StructType,
+    TimestampType,
 )
+from schema.checkpoint import CheckpointModel, CheckpointState
 from schema.datasource import DatasourceModel
 from schema.datatable import DataTableModel
 
 from . import databases as db_utils
+from . import pools, query_cache
+from .checkpoints import Checkpointer
+from .settings import settings
 
 
 def setup_connection(url: str) -> SparkSession:  # type: ignore
@@ -28,8 +60,53 @@ def setup_connection(url: str) -> SparkSession:  # type: ignore
             "org.apache.spark.sql.delta.catalog.DeltaCatalog",
         )
     )
-    spark = configure_spark_with_delta_pip(session_build).getOrCreate()
-    return spark
+    session_build = configure_spark_with_delta_pip(session_build)
+    # a separate session each time, getOrCreate() would share the default one
+    if hasattr(session_build, "create"):
+        return session_build.create()
+    # Spark Connect before 3.5 has no create(), Delta is set up by the cluster
+    return RemoteSparkSession(url)  # type: ignore
+
+
+def reset_session(spark: SparkSession):
+    """
+    Drop state left by user queries before the session is leased again:
+    SQL configs, current database, temporary views and cached tables
+    """
+    spark.sql("RESET")
+    spark.catalog.setCurrentDatabase("default")
+    for table in spark.catalog.listTables():
+        if table.isTemporary:
+            spark.catalog.dropTempView(table.name)
+    spark.catalog.clearCache()
+
+
+def is_session_alive(spark: SparkSession) -> bool:
+    try:
+        spark.sql("SELECT 1").collect()
+        return True
+    except Exception:
+        return False
+
+
+def spark_session(url: str) -> ContextManager[SparkSession]:
+    """
+    Lease a pooled session of Spark cluster. Sessions are reset when
+    released, idle ones are checked before reuse and replaced when
+    the cluster dropped them. Raises TimeoutError when all sessions
+    stay leased
+    """
+    pool = pools.get_pool(
+        url,
+        setup_connection,
+        is_session_alive,
+        reset_session,
+        max_size=settings.SPARK_POOL_MAX_SIZE,
+        idle_timeout=settings.SPARK_POOL_IDLE_TIMEOUT,
+        check_interval=settings.SPARK_POOL_CHECK_INTERVAL,
+        close=lambda spark: spark.stop(),
+    )
+    return pool.connection()
 
 
 def run_query(spark: SparkSession, query: str) -> List[str]:
@@ -38,6 +115,145 @@ def run_query(spark: SparkSession, query: str) -> List[str]:
     return res
 
 
+def iter_query_rows(
+    spark: SparkSession, query: str, batch_size: int = settings.QUERY_BATCH_SIZE
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Run query and yield its rows as dicts, `batch_size` rows at a time.
+    Spark Connect 3.4 has no toLocalIterator(), so the result is fetched
+    at once and rows are converted lazily
+    """
+    rows = iter(spark.sql(query).collect())
+    while chunk := list(islice(rows, batch_size)):
+        yield [row.asDict(recursive=True) for row in chunk]
+
+
+def get_table_version(spark: SparkSession, table_name: str) -> int:
+    row = spark.sql(f"DESCRIBE HISTORY {table_name} LIMIT 1").first()
+    if row is None:
+        raise ValueError(f"Table {table_name} has no history")
+    return int(row["version"])
+
+
+def get_run_id(table: DataTableModel, version: int) -> str:
+    """
+    Name the writes of an ingestion run staged at a table version
+    """
+    return f"ingest_{table.id.hex}_{version}"
+
+
+def restore_table(spark: SparkSession, table_name: str, version: int, run_id: str):
+    """
+    Roll Delta table back to its version before an ingestion run, dropping
+    commits of the run. Refused when anything else was committed since,
+    as those commits would be lost
+    """
+    history = (
+        spark.sql(f"DESCRIBE HISTORY {table_name}")
+        .where(F.col("version") > version)
+        .select("userMetadata")
+        .collect()
+    )
+    run_commits = [row["userMetadata"] == run_id for row in history]
+    if not any(run_commits):
+        return
+    if not all(run_commits):
+        raise ValueError(
+            f"Table {table_name} was written since the failed run, "
+            + "its chunks can't be rolled back"
+        )
+    spark.sql(f"RESTORE TABLE {table_name} TO VERSION AS OF {version}")
+    query_cache.invalidate_table(table_name)
+
+
+def get_table_versions(spark: SparkSession, tables: List[str]) -> Dict[str, int]:
+    """
+    Get current Delta versions of tables, raises if any table is missing
+    """
+    return {table: get_table_version(spark, table) for table in tables}
+
+
+def query_to_arrow(spark: SparkSession, query: str) -> pa.Table:
+    """
+    Get query result as Arrow table of Spark column types. Spark Connect 3.4
+    has no toArrow(), its toPandas() is built from the Arrow batches
+    sent by the cluster. Primitive, string and timestamp columns are
+    converted by column; decimal, array, map and struct values go through
+    Python objects row by row, timestamps nested in them aren't localized
+    """
+    df = spark.sql(query)
+    schema = to_arrow_schema(df.schema)
+    pdf = df.toPandas()
+    # timestamps come back as naive values of the session time zone,
+    # wall times repeated when DST ends are read as daylight time
+    time_zone = spark.conf.get("spark.sql.session.timeZone")
+    for i, field in enumerate(df.schema.fields):
+        if isinstance(field.dataType, TimestampType):
+            column = pdf.iloc[:, i].dt.tz_localize(time_zone, ambiguous=True)
+            pdf.isetitem(i, column)
+    # nullable integers come back from pandas as floats
+    return pa.Table.from_pandas(pdf, schema=schema, preserve_index=False)
+
+
+def to_arrow_stream(
+    table: pa.Table, batch_size: int = settings.QUERY_BATCH_SIZE
+) -> Iterator[bytes]:
+    """
+    Encode table in Arrow IPC streaming format, yield bytes
+    of every written batch
+    """
+    sink = io.BytesIO()
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_size):
+            writer.write_batch(batch)
+            yield drain()
+    # end-of-stream marker is written on close
+    yield drain()
+
+
+def to_json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value) if value.is_finite() else None
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    return str(value)
+
+
+def to_finite(value: Any) -> Any:
+    """
+    Replace NaN and infinity, which aren't valid JSON, with null
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, Decimal) and not value.is_finite():
+        return None
+    if isinstance(value, dict):
+        return {key: to_finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_finite(item) for item in value]
+    return value
+
+
+def to_ndjson(rows: List[Dict[str, Any]]) -> bytes:
+    """
+    Encode every row as a JSON object on its own line
+    """
+    lines = [
+        json.dumps(to_finite(row), default=to_json_value, allow_nan=False)
+        for row in rows
+    ]
+    return ("\n".join(lines) + "\n").encode() if lines else b""
+
+
 def create_schema(columns: List[db_utils.ColumnInfo]) -> StructType:
     schema = StructType(
         [
@@ -58,6 +274,7 @@ def create_table(
     schema = create_schema(columns)
     df = spark.createDataFrame([], schema)
     df.write.format("delta").mode("overwrite").saveAsTable(table_name)
+    query_cache.invalidate_table(table_name)
 
 
 def get_column_type(column_type: str) -> DataType:
@@ -66,6 +283,8 @@ def get_column_type(column_type: str) -> DataType:
     """
     if column_type == "int":
         return IntegerType()
+    if column_type == "bigint":
+        return LongType()
     if column_type == "str":
         return StringType()
     if column_type == "float":
@@ -75,25 +294,528 @@ def get_column_type(column_type: str) -> DataType:
     return StringType()
 
 
-def ingest_data(spark: SparkSession, ds: DatasourceModel, tables: List[DataTableModel]):
-    ds_url = (
-        f"{ds.ds_type.value}://"
-        + f"{ds.config['username']}:{ds.config['password']}@"
-        + f"{ds.config['host']}"
+class TransferStats(TypedDict):
+    rows: int
+    bytes: int
+    seconds: float
+    # the largest Arrow allocation of the process plus the pandas batch,
+    # measured while each batch is sent
+    peak_memory: int
+
+
+class TableIngestResult(TypedDict):
+    table_id: UUID
+    table_name: str
+    status: bool
+    details: str
+    watermark: str | None
+    stats: TransferStats | None
+
+
+def empty_stats() -> TransferStats:
+    return {"rows": 0, "bytes": 0, "seconds": 0.0, "peak_memory": 0}
+
+
+def merge_stats(first: TransferStats, second: TransferStats) -> TransferStats:
+    return {
+        "rows": first["rows"] + second["rows"],
+        "bytes": first["bytes"] + second["bytes"],
+        "seconds": first["seconds"] + second["seconds"],
+        "peak_memory": max(first["peak_memory"], second["peak_memory"]),
+    }
+
+
+def format_stats(stats: TransferStats) -> str:
+    seconds = stats["seconds"] or 1e-9
+    mb = 1024 * 1024
+    return (
+        f"{stats['rows']} rows in {stats['seconds']:.1f}s "
+        + f"({stats['rows'] / seconds:.0f} rows/s, "
+        + f"{stats['bytes'] / mb / seconds:.1f} MB/s), "
+        + f"peak memory {stats['peak_memory'] / mb:.1f} MB"
     )
-    for table in tables:
-        # get data into file
-        filepath, df = db_utils.from_table_to_file(ds_url, table)
-        ingest_from_file(spark, df, table.columns, table.name)
-        os.unlink(filepath)
 
 
-def ingest_from_file(
+def get_jdbc_options(ds: DatasourceModel) -> Dict[str, str]:
+    drivers = {
+        "postgresql": "org.postgresql.Driver",
+        "mysql": "com.mysql.cj.jdbc.Driver",
+    }
+    return {
+        "url": f"jdbc:{ds.ds_type.value}://{ds.config['host']}",
+        "user": ds.config["username"],
+        "password": ds.config["password"],
+        "driver": drivers[ds.ds_type.value],
+    }
+
+
+def read_jdbc(
     spark: SparkSession,
-    df: pd.DataFrame,
-    columns: List[Dict[str, str]],
+    ds_url: str,
+    jdbc_options: Dict[str, str],
+    table: DataTableModel,
+    batch_size: int,
+    partitions: int,
+    where: str | None = None,
+) -> DataFrame:
+    """
+    Make Spark cluster read a source table itself, split into ranges
+    of an integer column when several partitions are requested
+    """
+    columns = [column["name"] for column in table.columns]
+    query = db_utils.build_select_query(columns, table.name, where)
+    reader = (
+        spark.read.format("jdbc")
+        .options(**jdbc_options)
+        .option("dbtable", f"({query}) AS src")
+        .option("fetchsize", str(batch_size))
+    )
+    if partitions > 1:
+        column = db_utils.get_split_column(ds_url, table.name, table.columns)  # type: ignore
+        if column is not None:
+            lower, upper = db_utils.get_column_bounds(ds_url, table.name, column)
+            if lower is not None:
+                reader = reader.options(
+                    partitionColumn=column,
+                    lowerBound=str(lower),
+                    upperBound=str(upper),
+                    numPartitions=str(partitions),
+                )
+    df_spark = reader.load()
+    schema = create_schema(table.columns)  # type: ignore
+    return df_spark.select(
+        [df_spark[field.name].cast(field.dataType) for field in schema.fields]
+    )
+
+
+def ingest_staged_table(
+    spark: SparkSession,
+    ds_url: str,
+    table: DataTableModel,
+    batch_size: int,
+    partitions: int,
+    ds_limit: BoundedSemaphore,
+    write_limit: BoundedSemaphore,
+    checkpoints: Checkpointer | None = None,
+    saved: List[CheckpointModel] | None = None,
+    use_copy: bool = True,
+) -> Tuple[str | None, TransferStats]:
+    """
+    Extract table through staging files and write them to Delta table,
+    return the new high-water mark and transfer stats. Chunks already
+    staged or written by a failed run are reused while their files exist,
+    otherwise the table is extracted again. Every chunk is written in
+    a single commit tagged with the run and its chunk number, so Delta
+    skips chunks committed before the run failed
+    """
+    stats = empty_stats()
+    saved = saved or []
+    filepaths: List[str] = [c.filepath for c in saved if c.filepath is not None]
+    written = {c.chunk for c in saved if c.state == CheckpointState.WRITTEN}
+    version = saved[0].table_version if saved else None
+    try:
+        if not saved or not all(os.path.exists(path) for path in filepaths):
+            if saved and table.write_mode.value == "append":
+                # re-extracted rows would be appended twice, commits of the
+                # failed run are rolled back. Overwrite starts over from
+                # the first chunk and merge upserts rows again
+                if version is None:
+                    raise ValueError(
+                        f"Table {table.name} can't be restored, version is unknown"
+                    )
+                restore_table(spark, table.name, version, get_run_id(table, version))
+            for filepath in filepaths:
+                if os.path.exists(filepath):
+                    os.unlink(filepath)
+            version = None
+            if checkpoints is not None:
+                version = get_table_version(spark, table.name)
+            # incremental tables fetch only rows above the high-water mark
+            where = db_utils.get_watermark_filter(ds_url, table)
+            # get data into files, every partition takes a connection slot
+            filepaths = db_utils.read_table_to_files(
+                ds_url, table, batch_size, partitions, where, ds_limit, use_copy
+            )
+            written = set()
+            if checkpoints is not None:
+                checkpoints.stage(table.id, filepaths, version)
+        run_id = get_run_id(table, version) if version is not None else None
+        # write every range to the same table
+        for chunk, filepath in enumerate(filepaths):
+            if chunk in written:
+                continue
+            mode = table.write_mode.value
+            # only the first range replaces table content
+            if mode == "overwrite" and chunk > 0:
+                mode = "append"
+            txn = (run_id, chunk) if run_id is not None else None
+            with write_limit:
+                chunk_stats = ingest_from_file(
+                    spark,
+                    filepath,
+                    table.columns,
+                    table.name,
+                    mode,
+                    table.key_columns,
+                    txn,
+                )
+            stats = merge_stats(stats, chunk_stats)
+            if checkpoints is not None:
+                checkpoints.mark_written(table.id, chunk)
+        if table.watermark_column is not None:
+            return db_utils.get_max_value(filepaths, table.watermark_column), stats
+        return None, stats
+    finally:
+        # checkpointed files are kept until the table is committed
+        if checkpoints is None:
+            for filepath in filepaths:
+                os.unlink(filepath)
+
+
+def ingest_jdbc_table(
+    spark: SparkSession,
+    ds_url: str,
+    jdbc_options: Dict[str, str],
+    table: DataTableModel,
+    batch_size: int,
+    partitions: int,
+    ds_limit: BoundedSemaphore,
+    write_limit: BoundedSemaphore,
+    checkpoints: Checkpointer | None = None,
+    saved: List[CheckpointModel] | None = None,
+) -> str | None:
+    """
+    Copy table from the source to Delta table inside Spark cluster,
+    return the new high-water mark. The copy is skipped when a failed
+    run has already written it
+    """
+    saved = saved or []
+    if not any(c.state == CheckpointState.WRITTEN for c in saved):
+        where = db_utils.get_watermark_filter(ds_url, table)
+        with ds_limit, write_limit:
+            df_spark = read_jdbc(
+                spark,
+                ds_url,
+                jdbc_options,
+                table,
+                batch_size,
+                partitions,
+                where,  # type: ignore
+            )
+            write_to_table(
+                spark, df_spark, table.name, table.write_mode.value, table.key_columns
+            )
+        if checkpoints is not None:
+            checkpoints.mark_written(table.id, 0)
+    if table.watermark_column is not None:
+        row = spark.table(table.name).agg(F.max(table.watermark_column)).first()
+        return str(row[0]) if row is not None and row[0] is not None else None
+    return None
+
+
+def ingest_table(
+    spark: SparkSession,
+    ds_url: str,
+    jdbc_options: Dict[str, str] | None,
+    table: DataTableModel,
+    batch_size: int,
+    partitions: int,
+    ds_limit: BoundedSemaphore,
+    write_limit: BoundedSemaphore,
+    cancelled: Event | None = None,
+    checkpoints: Checkpointer | None = None,
+    use_copy: bool = True,
+) -> TableIngestResult:
+    result: TableIngestResult = {
+        "table_id": table.id,
+        "table_name": table.name,
+        "status": False,
+        "details": "",
+        "watermark": table.watermark,
+        "stats": None,
+    }
+    # tables still queued are skipped after cancellation
+    if cancelled is not None and cancelled.is_set():
+        result["details"] = "Cancelled"
+        return result
+    # concurrent runs would resume from each other's checkpoints
+    if checkpoints is not None and not checkpoints.claim(table.id):
+        result["details"] = "Table is being ingested by another run"
+        return result
+    try:
+        saved = checkpoints.get(table.id) if checkpoints is not None else []
+        stats = None
+        if jdbc_options is not None:
+            watermark = ingest_jdbc_table(
+                spark,
+                ds_url,
+                jdbc_options,
+                table,
+                batch_size,
+                partitions,
+                ds_limit,
+                write_limit,
+                checkpoints,
+                saved,
+            )
+        else:
+            watermark, stats = ingest_staged_table(
+                spark,
+                ds_url,
+                table,
+                batch_size,
+                partitions,
+                ds_limit,
+                write_limit,
+                checkpoints,
+                saved,
+                use_copy,
+            )
+        if checkpoints is not None:
+            checkpoints.commit(table.id, watermark)
+        details = "Ingested"
+        if stats is not None:
+            details += f", {format_stats(stats)}"
+        result.update(
+            status=True,
+            details=details,
+            watermark=watermark or table.watermark,
+            stats=stats,
+        )
+    except Exception as e:
+        result["details"] = str(e)
+    finally:
+        if checkpoints is not None:
+            checkpoints.release(table.id)
+    return result
+
+
+def ingest_datasources(
+    spark: SparkSession,
+    datasources: List[Tuple[DatasourceModel, List[DataTableModel]]],
+    cancelled: Event | None = None,
+    on_result: Callable[[TableIngestResult], None] | None = None,
+    checkpoints: Checkpointer | None = None,
+) -> List[TableIngestResult]:
+    """
+    Ingest tables of several datasources concurrently. Extraction runs on
+    a bounded thread pool, while Delta writes and connections to each
+    datasource are capped by semaphores. `on_result` is called with
+    the result of every table as soon as it is ingested. With `checkpoints`
+    a retry resumes from the first chunk not written by a failed run
+    """
+    write_limit = BoundedSemaphore(settings.INGEST_WRITE_WORKERS)
+    with ThreadPoolExecutor(max_workers=settings.INGEST_WORKERS) as executor:
+        futures = []
+        for ds, tables in datasources:
+            ds_url = (
+                f"{ds.ds_type.value}://"
+                + f"{ds.config['username']}:{ds.config['password']}@"
+                + f"{ds.config['host']}"
+            )
+            batch_size = int(ds.config.get("batch_size", settings.INGEST_BATCH_SIZE))
+            max_connections = ds.config.get(
+                "max_connections", settings.INGEST_DS_CONNECTIONS
+            )
+            # source connections come from a pool of limited size
+            ds_limit = BoundedSemaphore(
+                min(int(max_connections), settings.SOURCE_POOL_MAX_SIZE)
+            )
+            partitions = int(ds.config.get("partitions", settings.INGEST_PARTITIONS))
+            # relational sources can be read by Spark cluster directly
+            jdbc_options = None
+            if ds.config.get("extraction") == "jdbc":
+                jdbc_options = get_jdbc_options(ds)
+            # Postgres rows are streamed through a server-side cursor
+            # instead of COPY
+            use_copy = ds.config.get("extraction") != "cursor"
+            for table in tables:
+                future = executor.submit(
+                    ingest_table,
+                    spark,
+                    ds_url,
+                    jdbc_options,
+                    table,
+                    batch_size,
+                    partitions,
+                    ds_limit,
+                    write_limit,
+                    cancelled,
+                    checkpoints,
+                    use_copy,
+                )
+                futures.append(future)
+        if on_result is not None:
+            for future in as_completed(futures):
+                on_result(future.result())
+        return [future.result() for future in futures]
+
+
+def ingest_data(
+    spark: SparkSession,
+    ds: DatasourceModel,
+    tables: List[DataTableModel],
+    checkpoints: Checkpointer | None = None,
+) -> List[TableIngestResult]:
+    return ingest_datasources(spark, [(ds, tables)], checkpoints=checkpoints)
+
+
+def merge_into_table(
+    spark: SparkSession, df_spark: DataFrame, table_name: str, key_columns: List[str]
+):
+    """
+    Upsert rows into Delta table by key columns
+    """
+    view_name = f"staged_{uuid.uuid4().hex}"
+    # duplicated keys would match a target row several times
+    df_spark.dropDuplicates(key_columns).createOrReplaceTempView(view_name)
+    condition = " AND ".join(f"t.`{key}` = s.`{key}`" for key in key_columns)
+    try:
+        spark.sql(
+            f"""
+            MERGE INTO {table_name} t USING {view_name} s ON {condition}
+            WHEN MATCHED THEN UPDATE SET *
+            WHEN NOT MATCHED THEN INSERT *
+            """
+        )
+    finally:
+        spark.catalog.dropTempView(view_name)
+
+
+def write_to_table(
+    spark: SparkSession,
+    df_spark: DataFrame,
     table_name: str,
+    mode: str = "append",
+    key_columns: List[str] | None = None,
+    txn: Tuple[str, int] | None = None,
 ):
+    """
+    Write data to Delta table. With `txn` the write is tagged with
+    an application id and a version: Delta skips it when that version
+    is already committed, and the id is kept in the commit history.
+    Merge isn't tagged, upserting the same rows again changes nothing
+    """
+    try:
+        if mode == "merge":
+            merge_into_table(spark, df_spark, table_name, key_columns)  # type: ignore
+        else:
+            writer = df_spark.write.format("delta").mode(mode)
+            if txn is not None:
+                app_id, version = txn
+                writer = writer.options(
+                    txnAppId=app_id, txnVersion=str(version), userMetadata=app_id
+                )
+            writer.saveAsTable(table_name)
+    finally:
+        # a failed write may still have committed a version
+        query_cache.invalidate_table(table_name)
+
+
+def send_batches(
+    spark: SparkSession,
+    batches: Iterable[pa.RecordBatch],
+    columns: List[Dict[str, str]],
+    table_name: str,
+) -> TransferStats:
+    """
+    Append record batches to a table one at a time, so only a single batch
+    is held in memory, return transfer stats
+    """
+    start = time.perf_counter()
     schema = create_schema(columns)  # type: ignore
-    df_spark = spark.createDataFrame(df, schema)
-    df_spark.write.format("delta").mode("append").saveAsTable(table_name)
+    stats = empty_stats()
+    for batch in batches:
+        # types are already exact, Spark doesn't need to infer them
+        df_batch = batch.to_pandas()
+        # Arrow buffers allocated by the process plus the pandas copy
+        memory = pa.total_allocated_bytes() + int(
+            df_batch.memory_usage(deep=True).sum()
+        )
+        df_spark = spark.createDataFrame(df_batch, schema)
+        write_to_table(spark, df_spark, table_name)
+        stats["rows"] += batch.num_rows
+        stats["bytes"] += batch.nbytes
+        stats["peak_memory"] = max(stats["peak_memory"], memory)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def ingest_batches(
+    spark: SparkSession,
+    batches: Iterable[pa.RecordBatch],
+    columns: List[Dict[str, str]],
+    table_name: str,
+    mode: str = "append",
+    key_columns: List[str] | None = None,
+    txn: Tuple[str, int] | None = None,
+) -> TransferStats:
+    """
+    Send record batches to a staging table, then move them to the table
+    in a single write, so a failure leaves the table unchanged and merge
+    runs once. Return transfer stats
+    """
+    start = time.perf_counter()
+    staging_table = f"staged_{uuid.uuid4().hex}"
+    create_table(spark, staging_table, columns)  # type: ignore
+    try:
+        stats = send_batches(spark, batches, columns, staging_table)
+        staged = spark.table(staging_table)
+        write_to_table(spark, staged, table_name, mode, key_columns, txn)
+    finally:
+        spark.sql(f"DROP TABLE IF EXISTS {staging_table}")
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def frame_to_batches(
+    df: pd.DataFrame, columns: List[Dict[str, str]]
+) -> List[pa.RecordBatch]:
+    """
+    Convert data to table types with Arrow, split into record batches
+    of limited size
+    """
+    arrow_schema = db_utils.create_arrow_schema(columns)  # type: ignore
+    # NaN is converted to null
+    data = pa.Table.from_pandas(df[arrow_schema.names], preserve_index=False)
+    try:
+        data = db_utils.cast_to_schema(data, arrow_schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        # overflowing or fractional values aren't written
+        raise ValueError(f"Data doesn't match column types: {e}")
+    return data.to_batches(max_chunksize=settings.SPARK_ARROW_BATCH_SIZE)
+
+
+def ingest_from_file(
+    spark: SparkSession,
+    filepath: str,
+    columns: List[Dict[str, str]],
+    table_name: str,
+    mode: str = "append",
+    key_columns: List[str] | None = None,
+    txn: Tuple[str, int] | None = None,
+) -> TransferStats:
+    """
+    Send a staged file to Spark cluster in record batches read one
+    at a time and write it to the table in a single commit
+    """
+    batches = db_utils.read_staged_batches(filepath)
+    return ingest_batches(spark, batches, columns, table_name, mode, key_columns, txn)
+
+
+def ingest_chunks(
+    spark: SparkSession,
+    chunks: Iterable[pd.DataFrame],
+    columns: List[Dict[str, str]],
+    table_name: str,
+    mode: str = "append",
+    key_columns: List[str] | None = None,
+) -> TransferStats:
+    """
+    Write chunks of data to a staging table one by one, so only a single chunk
+    is kept in memory, then move them to the table in a single write.
+    A failed upload leaves the table unchanged. Return transfer stats
+    of all chunks
+    """
+    batches = chain.from_iterable(frame_to_batches(df, columns) for df in chunks)
+    return ingest_batches(spark, batches, columns, table_name, mode, key_columns)
@@ -0,0 +1,119 @@
+import json
+import os
+import uuid
+
+import pyarrow as pa
+import pytest
+from schema.user import UserModel
+from services.query import QueryService
+from utils import cursors
+
+OWNER = uuid.uuid4()
+
+
+@pytest.fixture(autouse=True)
+def tmp_cwd(tmp_path, monkeypatch):
+    # spilled files are written under the working directory
+    monkeypatch.chdir(tmp_path)
+    yield
+    cursors.close_all()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cursors.time, "monotonic", lambda: now[0])
+    return now
+
+
+def create_cursor(num_rows=5, page_size=2):
+    table = pa.table({"id": list(range(num_rows))})
+    return cursors.create_cursor(table, OWNER, page_size)
+
+
+def test_pages_follow_tokens():
+    token = create_cursor()
+    ids = []
+    while token is not None:
+        rows, token = cursors.fetch_page(token, OWNER)
+        ids += [row["id"] for row in rows]
+    assert ids == [0, 1, 2, 3, 4]
+
+
+def test_page_fetch_can_be_repeated():
+    token = create_cursor()
+    first = cursors.fetch_page(token, OWNER)
+    assert cursors.fetch_page(token, OWNER) == first
+    _, next_token = first
+    assert cursors.fetch_page(next_token, OWNER)[0] == [{"id": 2}, {"id": 3}]
+
+
+def test_empty_result_has_one_page():
+    token = create_cursor(num_rows=0)
+    assert cursors.fetch_page(token, OWNER) == ([], None)
+
+
+def test_cursor_belongs_to_owner():
+    token = create_cursor()
+    assert cursors.fetch_page(token, uuid.uuid4()) is None
+    assert not cursors.close_cursor(token, uuid.uuid4())
+
+
+@pytest.mark.parametrize("token", ["", "abc", "abc.x", "abc.-1"])
+def test_invalid_tokens(token):
+    create_cursor()
+    assert cursors.fetch_page(token, OWNER) is None
+
+
+def test_cursor_expires(clock):
+    token = create_cursor()
+    cursor_id, _ = cursors.parse_token(token)
+    filepath = cursors.cursors[cursor_id]["filepath"]
+    clock[0] += cursors.settings.CURSOR_TTL - 1
+    # fetching extends cursor lifetime
+    assert cursors.fetch_page(token, OWNER) is not None
+    clock[0] += cursors.settings.CURSOR_TTL - 1
+    assert cursors.fetch_page(token, OWNER) is not None
+    clock[0] += cursors.settings.CURSOR_TTL + 1
+    assert cursors.fetch_page(token, OWNER) is None
+    assert not os.path.exists(filepath)
+
+
+def test_close_cursor_removes_file():
+    token = create_cursor()
+    cursor_id, _ = cursors.parse_token(token)
+    filepath = cursors.cursors[cursor_id]["filepath"]
+    assert cursors.close_cursor(token, OWNER)
+    assert not os.path.exists(filepath)
+    assert cursors.fetch_page(token, OWNER) is None
+    assert not cursors.close_cursor(token, OWNER)
+
+
+def test_file_is_kept_until_page_is_read(monkeypatch):
+    token = create_cursor()
+    cursor_id, _ = cursors.parse_token(token)
+    filepath = cursors.cursors[cursor_id]["filepath"]
+    memory_map = pa.memory_map
+
+    def close_while_reading(path):
+        # cursor is closed by another request in the middle of the read
+        assert cursors.close_cursor(token, OWNER)
+        assert os.path.exists(path)
+        return memory_map(path)
+
+    monkeypatch.setattr(cursors.pa, "memory_map", close_while_reading)
+    rows, _ = cursors.fetch_page(token, OWNER)
+    assert rows == [{"id": 0}, {"id": 1}]
+    assert not os.path.exists(filepath)
+
+
+def test_pages_are_valid_json():
+    table = pa.table({"x": [1.5, float("nan"), float("inf")]})
+    token = cursors.create_cursor(table, OWNER, 3)
+    user = UserModel(
+        id=OWNER, username="owner", email="owner@example.com", password="x"
+    )
+    status_code, page = QueryService(None, user).fetch_page(token)  # type: ignore
+    assert status_code == 200
+    assert page["rows"] == [{"x": 1.5}, {"x": None}, {"x": None}]
+    json.dumps(page, allow_nan=False)
@@ -0,0 +1,173 @@
+import re
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import utils.databases as db_utils
+from schema.datatable import DataTableModel
+
+
+@pytest.mark.parametrize(
+    "values, column_type",
+    [
+        ([1, None, 3], "bigint"),
+        ([None, 2**40], "bigint"),
+        ([1, 2.5, None], "float"),
+        ([True, None], "bool"),
+        (["a", None], "str"),
+    ],
+)
+def test_infer_mongodb_type_skips_missing_values(values, column_type):
+    assert db_utils.infer_mongodb_type(pd.Series(values, dtype=object)) == column_type
+
+
+def test_sparse_mongodb_fields(monkeypatch):
+    documents = [
+        {"_id": 1, "qty": 5, "customer": {"age": 30}},
+        {"_id": 2, "customer": {"name": "Bob"}},
+        {"_id": 3, "qty": 7, "customer": {"age": 41}},
+    ]
+    # sampled collections by database
+    client = {"shop": {"orders": documents}}
+    monkeypatch.setattr(
+        db_utils, "get_mongodb_connection", lambda url: (client, "shop")
+    )
+    monkeypatch.setattr(db_utils, "sample_mongodb_documents", lambda coll: coll)
+    info = db_utils.get_mongodb_tables_info("mongodb://localhost/shop", ["orders"])
+    columns = {c["name"]: c["type"] for c in info[0]["columns"]}
+    # fields missing from some documents are not turned into floats
+    assert columns["qty"] == "bigint"
+    assert columns["customer.age"] == "bigint"
+    assert columns["customer.name"] == "str"
+
+
+def test_flatten_document():
+    document = {"a": 1, "b": {"c": {"d": None}, "e": [1, 2]}}
+    assert db_utils.flatten_document(document) == {"a": 1, "b.c.d": None, "b.e": [1, 2]}
+
+
+def test_copy_csv_to_parquet_keeps_null_like_text(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    csv_path = tmp_path / "copy.csv"
+    # Postgres COPY quotes only values that need it, NULL is an empty value
+    csv_path.write_text('NA,1,t\nnull,2,f\nN/A,,\n"",6,t\n,7,f\nnan,8,t\n')
+    schema = pa.schema([("code", pa.string()), ("qty", pa.int32()), ("ok", pa.bool_())])
+    filepath = db_utils.copy_csv_to_parquet(str(csv_path), schema)
+    table = pq.read_table(filepath)
+    assert table.schema == schema
+    assert table.to_pydict() == {
+        "code": ["NA", "null", "N/A", "", None, "nan"],
+        "qty": [1, 2, None, 6, 7, 8],
+        "ok": [True, False, None, True, False, True],
+    }
+
+
+@pytest.mark.parametrize(
+    "values, data_type, expected",
+    [
+        ([1, None, 2**31 - 1], pa.int32(), [1, None, 2**31 - 1]),
+        ([2.0, True], pa.int64(), [2, 1]),
+        ([1, 0, None], pa.bool_(), [True, False, None]),
+        ([2**40, Decimal("1.5"), None], pa.float32(), [2**40, 1.5, None]),
+        ([1, "a", None], pa.string(), ["1", "a", None]),
+    ],
+)
+def test_to_arrow_array(values, data_type, expected):
+    array = db_utils.to_arrow_array(values, data_type)
+    assert array.type == data_type
+    assert array.to_pylist() == expected
+
+
+@pytest.mark.parametrize(
+    "values, data_type",
+    [([2**31], pa.int32()), ([1.5], pa.int32()), ([2**63], pa.int64())],
+)
+def test_to_arrow_array_rejects_lossy_values(values, data_type):
+    with pytest.raises((pa.ArrowInvalid, OverflowError)):
+        db_utils.to_arrow_array(values, data_type)
+
+
+def test_cast_to_schema():
+    table = pa.table(
+        {
+            "id": pa.array([1, 2], pa.int64()),
+            "price": pa.array([Decimal("1.25"), None], pa.decimal128(10, 2)),
+            "big": pa.array([2**40 + 1, 0], pa.int64()),
+            "extra": ["a", "b"],
+        }
+    )
+    schema = pa.schema(
+        [("id", pa.int32()), ("price", pa.float32()), ("big", pa.float32())]
+    )
+    cast = db_utils.cast_to_schema(table, schema)
+    assert cast.schema == schema
+    # integers cast to float keep only float precision
+    assert cast.to_pydict() == {"id": [1, 2], "price": [1.25, None], "big": [2**40, 0]}
+
+
+@pytest.mark.parametrize(
+    "column",
+    [pa.array([2**31], pa.int64()), pa.array([1.5], pa.float64())],
+)
+def test_cast_to_schema_rejects_lossy_values(column):
+    table = pa.table({"id": column})
+    with pytest.raises(pa.ArrowInvalid):
+        db_utils.cast_to_schema(table, pa.schema([("id", pa.int32())]))
+
+
+@pytest.mark.parametrize(
+    "lower, upper, partitions, count",
+    [(1, 10, 3, 3), (1, 2, 5, 2), (-5, 5, 4, 4), (7, 7, 3, 1)],
+)
+def test_split_predicates_cover_range_once(lower, upper, partitions, count):
+    predicates = db_utils.get_split_predicates("id", lower, upper, partitions)
+    assert len(predicates) == count
+    assert predicates[0].endswith(" OR id IS NULL")
+    ranges = [
+        tuple(map(int, re.search(r"id >= (-?\d+) AND id < (-?\d+)", p).groups()))
+        for p in predicates
+    ]
+    # ranges are adjacent, every value falls into exactly one of them
+    assert ranges[0][0] == lower
+    assert ranges[-1][1] == upper + 1
+    assert all(prev[1] == next[0] for prev, next in zip(ranges, ranges[1:]))
+    assert all(start < end for start, end in ranges)
+
+
+def make_table(column_type, watermark):
+    return DataTableModel(
+        id=uuid.uuid4(),
+        name="orders",
+        datasource_id=uuid.uuid4(),
+        columns=[{"name": "mark", "type": column_type}],
+        watermark_column="mark",
+        watermark=watermark,
+    )
+
+
+@pytest.mark.parametrize(
+    "url, column_type, watermark, expected",
+    [
+        ("postgresql://db", "bigint", "9007199254740993", "mark > 9007199254740993"),
+        ("mysql://db", "float", "2.5", "mark > 2.5"),
+        ("postgresql://db", "str", "O'Brien", "mark > 'O''Brien'"),
+        ("mongodb://db", "int", "5", {"mark": {"$gt": 5}}),
+        (
+            "mongodb://db",
+            "datetime",
+            "2023-05-01T10:00:00",
+            {"mark": {"$gt": datetime(2023, 5, 1, 10)}},
+        ),
+    ],
+)
+def test_watermark_filter(url, column_type, watermark, expected):
+    table = make_table(column_type, watermark)
+    assert db_utils.get_watermark_filter(url, table) == expected
+
+
+def test_watermark_filter_without_mark():
+    assert db_utils.get_watermark_filter("mysql://db", make_table("int", None)) is None
@@ -0,0 +1,107 @@
+import pytest
+from cachetools import LRUCache
+from utils import query_cache
+
+NODE_URL = "sc://node:15002"
+TABLES = ["Sales", "orders"]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    query_cache.results.clear()
+    query_cache.stats.update(hits=0, misses=0)
+    yield
+    query_cache.results.clear()
+
+
+def versions_of(versions):
+    return lambda tables: {table: versions[table] for table in tables}
+
+
+def test_normalize_query_keeps_literals():
+    query = "SELECT  *\nFROM Sales WHERE name = 'Bob';"
+    assert query_cache.normalize_query(query) == (
+        "select * from sales where name = 'Bob'"
+    )
+
+
+@pytest.mark.parametrize(
+    "query, tables",
+    [
+        ("select * from sales", ["Sales"]),
+        ("select * from `Sales` where note = 'from users'", ["Sales"]),
+        ("select * from default.sales s left join orders o on s.id = o.id", TABLES),
+        ("select * from spark_catalog.default.sales, orders", TABLES),
+        ("select * from sales where id in (select id from orders)", TABLES),
+    ],
+)
+def test_find_tables(query, tables):
+    assert query_cache.find_tables(query, TABLES) == tables
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "select 1",
+        "select * from sales_view",
+        "select * from other.sales",
+        "select * from (select * from sales) t",
+        "select * from range(10)",
+        "select *, current_timestamp() from sales",
+        "select * from sales order by rand()",
+        "insert into orders select * from sales",
+        "create table archive as select * from sales",
+        "explain select * from sales",
+    ],
+)
+def test_find_tables_uncacheable(query):
+    assert query_cache.find_tables(query, TABLES) is None
+
+
+def test_hit_requires_same_versions():
+    query_cache.put(NODE_URL, "select * from sales", {"Sales": 3}, [{"id": 1}])
+    result = query_cache.get(NODE_URL, "select * from sales", versions_of({"Sales": 3}))
+    assert result == [{"id": 1}]
+    # table written by another client
+    result = query_cache.get(NODE_URL, "select * from sales", versions_of({"Sales": 4}))
+    assert result is None
+    # versions can't be read
+    assert query_cache.get(NODE_URL, "select * from sales", lambda _: None) is None
+    assert query_cache.get_stats()["hits"] == 1
+    assert query_cache.get_stats()["misses"] == 2
+
+
+def test_versions_are_not_read_for_unknown_queries():
+    def get_versions(tables):
+        raise AssertionError("versions read on a miss")
+
+    assert query_cache.get(NODE_URL, "select * from sales", get_versions) is None
+
+
+def test_invalidate_table():
+    query_cache.put(NODE_URL, "select * from sales", {"Sales": 1}, [])
+    query_cache.put(NODE_URL, "select * from orders", {"orders": 1}, [])
+    query_cache.invalidate_table("Sales")
+    assert (NODE_URL, "select * from sales") not in query_cache.results
+    assert (NODE_URL, "select * from orders") in query_cache.results
+
+
+def test_empty_results_are_cached():
+    query_cache.put(NODE_URL, "select * from sales", {"Sales": 1}, [])
+    result = query_cache.get(NODE_URL, "select * from sales", versions_of({"Sales": 1}))
+    assert result == []
+    assert query_cache.get_stats()["bytes"] > 0
+
+
+def test_cache_is_bounded_by_result_size(monkeypatch):
+    results = LRUCache(maxsize=100, getsizeof=query_cache.get_entry_size)
+    monkeypatch.setattr(query_cache, "results", results)
+    query_cache.put(NODE_URL, "select * from sales", {"Sales": 1}, ["x" * 40])
+    query_cache.put(NODE_URL, "select * from orders", {"orders": 1}, ["x" * 40])
+    # a single long row outweighs both results
+    query_cache.put(NODE_URL, "select id from sales", {"Sales": 1}, ["x" * 90])
+    assert len(query_cache.results) == 1
+    assert query_cache.get_stats()["bytes"] <= 100
+    # result larger than the whole cache isn't kept
+    query_cache.put(NODE_URL, "select name from sales", {"Sales": 1}, ["x" * 200])
+    assert (NODE_URL, "select name from sales") not in query_cache.results
@@ -0,0 +1,73 @@
+import json
+import math
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import utils.spark_helpers as spk
+from pyspark.sql.types import LongType, StructField, StructType, TimestampType
+
+
+class FakeConf:
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, key):
+        return self.values[key]
+
+
+class FakeDataFrame:
+    def __init__(self, schema, pdf):
+        self.schema = schema
+        self.pdf = pdf
+
+    def toPandas(self):
+        return self.pdf
+
+
+class FakeSpark:
+    def __init__(self, df, time_zone):
+        self.df = df
+        self.conf = FakeConf({"spark.sql.session.timeZone": time_zone})
+
+    def sql(self, query):
+        return self.df
+
+
+def test_query_to_arrow_keeps_timestamp_instants():
+    schema = StructType(
+        [StructField("at", TimestampType()), StructField("id", LongType())]
+    )
+    # Spark 3.4 returns naive wall times of the session time zone
+    pdf = pd.DataFrame(
+        {"at": pd.to_datetime(["2023-07-01 12:00", None]), "id": [1.0, None]}
+    )
+    spark = FakeSpark(FakeDataFrame(schema, pdf), "Europe/Kyiv")
+    table = spk.query_to_arrow(spark, "SELECT * FROM events")  # type: ignore
+    assert table.schema.field("at").type == pa.timestamp("us", tz="UTC")
+    assert table.schema.field("id").type == pa.int64()
+    assert table.to_pydict() == {
+        "at": [datetime(2023, 7, 1, 9, tzinfo=timezone.utc), None],
+        "id": [1, None],
+    }
+
+
+def test_to_finite():
+    row = {"a": math.nan, "b": [math.inf, 1.5], "c": Decimal("NaN"), "d": "nan"}
+    assert spk.to_finite(row) == {"a": None, "b": [None, 1.5], "c": None, "d": "nan"}
+
+
+def test_to_ndjson():
+    rows = [{"x": math.nan, "at": datetime(2023, 1, 1)}, {"x": Decimal("1.5")}]
+    lines = spk.to_ndjson(rows).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"x": None, "at": "2023-01-01T00:00:00"},
+        {"x": 1.5},
+    ]
+
+
+def test_to_arrow_stream_round_trip():
+    table = pa.table({"id": list(range(5))})
+    data = b"".join(spk.to_arrow_stream(table, batch_size=2))
+    assert pa.ipc.open_stream(data).read_all() == table